@@ -0,0 +1,38 @@
+import time
+from psychopy import visual
+from expt.models import SubjectOptionModel
+from expt.stimuli import Stimuli, shape_factories
+
+n_repeats = 5
+
+
+def build_stimuli(win, eager):
+    """
+    Creates the shapes of a subject's option sets: all 12 shapes per color
+    if eager, as before shapes were created lazily, or else only the 3
+    shapes of each color's set. Each shape is built exactly once.
+    """
+    model = SubjectOptionModel()
+    stims = []
+    for option_set in model.option_sets:
+        stimuli = Stimuli(win=win, color=option_set.color)
+        shape_names = shape_factories if eager else option_set.shape_names
+        stims += stimuli.get_stims(shape_names)
+    return stims
+
+
+if __name__ == "__main__":
+    # time from creating the options to having the subject's stimuli ready
+    win = visual.Window([1920, 1080], fullscr=True, units="pix", color=(-1, -1, -1))
+
+    for eager in [True, False]:
+        durations = []
+        for _ in range(n_repeats):
+            start = time.perf_counter()
+            build_stimuli(win, eager)
+            durations.append(time.perf_counter() - start)
+
+        mode = "eager (all 12 shapes per color)" if eager else "lazy (3 shapes per color)"
+        print(f"{mode}: {1000 * min(durations):.1f} ms (best of {n_repeats})")
+
+    win.close()
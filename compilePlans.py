@@ -0,0 +1,9 @@
+import sys
+from expt.plans import compile_cohort_plans
+
+
+if __name__ == "__main__":
+    # compile the day plans of subjects first_id..last_id for offline review
+    first_id, last_id = int(sys.argv[1]), int(sys.argv[2])
+    file_paths = compile_cohort_plans(range(first_id, last_id + 1))
+    print(f"Compiled {len(file_paths)} day plans into {file_paths[0].parent}")
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from typing import List
+from psychopy import visual
+from expt.options import ChoiceOption
+
+
+@dataclass
+class StimulusAtlas:
+    """
+    Pre-rendered images of the choice options at the left and right
+    positions. Each option is rasterized once (BufferImageStim) and then
+    drawn as a single textured quad. Text options are re-rendered only
+    when their text has changed since they were captured.
+    """
+
+    win: visual.Window
+    half_size: float = 0.2  # half width/height of a captured option, in height units
+
+    def __post_init__(self):
+        self._images = {}
+
+    def _capture_rect(self, option: ChoiceOption) -> list:
+        """Screen region around the option's position, in norm units."""
+        width, height = self.win.size
+        x, y = option.shape.pos
+        half_width = 2 * self.half_size * height / width
+        centre_x = 2 * x * height / width
+        centre_y = 2 * y
+        return [
+            centre_x - half_width,
+            centre_y + 2 * self.half_size,
+            centre_x + half_width,
+            centre_y - 2 * self.half_size,
+        ]
+
+    def _image_pos(self, option: ChoiceOption) -> list:
+        """Option's position in pix, the units of its captured image."""
+        height = self.win.size[1]
+        x, y = option.shape.pos
+        return [x * height, y * height]
+
+    @staticmethod
+    def _version(option: ChoiceOption):
+        # the image of a text option is stale once its text changes
+        return getattr(option.shape, "text", None)
+
+    def _render(self, option: ChoiceOption, side: str) -> None:
+        option.refresh_text()
+        option.set_position(newPos=side)
+        image = visual.BufferImageStim(
+            self.win,
+            stim=[option.shape],
+            rect=self._capture_rect(option),
+            pos=self._image_pos(option),
+        )
+        self._images[(id(option), side)] = (self._version(option), image)
+
+    def _is_current(self, option: ChoiceOption, side: str) -> bool:
+        key = (id(option), side)
+        return (key in self._images) and (
+            self._images[key][0] == self._version(option)
+        )
+
+    def prerender(self, options: List[ChoiceOption]) -> None:
+        """
+        Renders every option at both positions, e.g. at session setup.
+        Images that are still current (e.g. warmed up) are kept.
+        """
+        for option in options:
+            for side in ["left", "right"]:
+                if not self._is_current(option, side):
+                    self._render(option, side)
+        self.win.clearBuffer()
+
+    def prepare(self, option: ChoiceOption, side: str) -> None:
+        """
+        Renders the option's image at a side if it is missing or stale.
+        Uses the back buffer, so call it before drawing the next frame.
+        """
+        if not self._is_current(option, side):
+            self._render(option, side)
+            self.win.clearBuffer()
+
+    def image(self, option: ChoiceOption, side: str) -> visual.BufferImageStim:
+        """The option's up to date image at a side."""
+        self.prepare(option, side)
+        return self._images[(id(option), side)][1]
+
+    def draw(self, option: ChoiceOption, side: str) -> None:
+        """Draws the option's image at a side."""
+        self.image(option, side).draw()
@@ -0,0 +1,75 @@
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+
+# bump when the layout of the checkpoint state changes
+checkpoint_version = 1
+
+
+def _initial_state() -> dict:
+    return {
+        "version": checkpoint_version,
+        "session_index": 0,  # position in day_sessions of the running session
+        "payoff_list": [],  # payoffs of the finished testing sessions
+        "session": None,  # progress within the running session
+        "adaptive_state": None,
+    }
+
+
+@dataclass
+class Checkpoint:
+    """
+    Progress of a subject's experiment day, saved atomically after every
+    `every` trials. All trial randomness comes from counter-based streams
+    keyed on the session, so the sequence, rewards and payoff trials are
+    recomputed on resume; only the position in the day, the payoffs so
+    far and the adaptive state need to be saved.
+    """
+
+    subject_id: int
+    day: int
+    checkpoint_dir: str = "./data"
+    every: int = 1
+    state: dict = field(default_factory=_initial_state)
+
+    @property
+    def file_path(self) -> Path:
+        return Path(self.checkpoint_dir) / (
+            f"checkpoint_subject_{self.subject_id}_day_{self.day}.json"
+        )
+
+    def save(self, state: dict = None) -> None:
+        """
+        Writes the state (or a given snapshot of it) to a temporary file
+        and renames it into place.
+        """
+        state = self.state if state is None else state
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.file_path)
+
+    @classmethod
+    def load(cls, subject_id: int, day: int, checkpoint_dir: str = "./data", **kwargs):
+        """The saved checkpoint of a subject's day, or None if there is none."""
+        checkpoint = cls(subject_id, day, checkpoint_dir=checkpoint_dir, **kwargs)
+        if not checkpoint.file_path.exists():
+            return None
+
+        with open(checkpoint.file_path) as f:
+            checkpoint.state = json.load(f)
+        if checkpoint.state["version"] != checkpoint_version:
+            raise ValueError(
+                f"{checkpoint.file_path} is a version {checkpoint.state['version']} "
+                f"checkpoint, which can't be resumed by version {checkpoint_version}!"
+            )
+        return checkpoint
+
+    def remove(self) -> None:
+        """Deletes the checkpoint once the day is complete."""
+        if self.file_path.exists():
+            self.file_path.unlink()
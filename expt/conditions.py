@@ -2,6 +2,32 @@ from dataclasses import dataclass
 import numpy as np
 
 
+# (session type, session id) of each session on the two experiment days;
+# testing session 0 is the adaptive testing session
+day_sessions = {
+    1: [
+        ("training", 1),
+        ("training", 2),
+        ("testing", 0),
+        ("testing", 1),
+        ("testing", 2),
+        ("testing", 3),
+    ],
+    2: [("practice", 1)] + [("testing", session_id) for session_id in range(4, 11)],
+}
+
+
+# record layout of one trial in a generated sequence
+trial_dtype = np.dtype(
+    [
+        ("Condition", np.int16),
+        ("option_a", np.int16),
+        ("option_b", np.int16),
+        ("bonus_trial", np.bool_),
+    ]
+)
+
+
 @dataclass
 class TrialSequence:
     session_type: str
@@ -19,80 +45,151 @@ class TrialSequence:
             self.n_trials_per_session = 210
             self.n_repeats = 7
 
-    @property
-    def trial_conditions(self):
-        # weighted list of trial conditions
-        conditions = list(
-            np.repeat(
-                np.append(
-                    np.repeat(np.arange(6), self.rel_freq), np.arange(6, 12), axis=0
-                ),
-                self.n_repeats,
-            )
+        self._setup_base_sequence()
+
+    def _setup_base_sequence(self) -> None:
+        """
+        Weighted (unshuffled) list of regular trial conditions and, for
+        testing sessions, the bonus condition to insert after each of them.
+        """
+        self.base_conditions = np.repeat(
+            np.append(np.repeat(np.arange(6), self.rel_freq), np.arange(6, 12)),
+            self.n_repeats,
         )
-        np.random.shuffle(conditions)
-
-        return conditions
-
-    def _get_options_for_condition(self, condition):
-        # define option set for each condition
-        if condition < 12:
-            if condition % 3 == 0:
-                choiceSet = [condition + 1, condition + 2]  # 1 v 2; PMT 0
-            elif condition % 3 == 1:
-                choiceSet = [condition - 1, condition + 1]  # 0 v 2; PMT 1
-            else:
-                choiceSet = [condition - 2, condition - 1]  # 0 v 1; PMT 2
-        elif condition < 24:
-            choiceSet = [condition - 12, condition]
-        elif condition < 36:
-            choiceSet = [condition - 24, condition]
-        np.random.shuffle(choiceSet)
-        return choiceSet
-
-    def _add_bonus_trials(self, conditions):
-        # function to insert bonus trials in given sequence
+
+        # label occurrences of each option in order; since the base sequence
+        # is shuffled uniformly, the occurrences labelled 0, 1, ... end up at
+        # uniformly random positions among those of the option
+        occurrence = np.zeros(len(self.base_conditions), dtype=int)
         for option_id in range(12):
-            ids = [i for i in range(len(conditions)) if conditions[i] == option_id]
-            np.random.shuffle(ids)
-            idx_plus_Delta = ids[: int(self.n_bonus_trials_per_option / 2)]
-            idx_minus_Delta = ids[
-                int(self.n_bonus_trials_per_option / 2) : self.n_bonus_trials_per_option
-            ]
-
-            ids_both_Delta = idx_plus_Delta + idx_minus_Delta
-            ids_both_Delta.sort(reverse=True)
-            ids.sort()
-
-            # indicate pmt trial and type
-            for idx in ids_both_Delta:
-                if idx in idx_plus_Delta:
-                    conditions.insert(idx + 1, conditions[idx] + 12)
-                elif idx in idx_minus_Delta:
-                    conditions.insert(idx + 1, conditions[idx] + 24)
-
-        return conditions
+            is_option = self.base_conditions == option_id
+            occurrence[is_option] = np.arange(is_option.sum())
+
+        # first half of the bonus trials are +Delta (condition + 12),
+        # second half are -Delta (condition + 24)
+        n_plus_delta = int(self.n_bonus_trials_per_option / 2)
+        self.bonus_offsets = np.zeros(len(self.base_conditions), dtype=int)
+        if self.session_type == "testing":
+            self.bonus_offsets[occurrence < n_plus_delta] = 12
+            self.bonus_offsets[
+                (occurrence >= n_plus_delta)
+                & (occurrence < self.n_bonus_trials_per_option)
+            ] = 24
 
     @property
-    def condition_sequence(self):
-        # sequence of trial conditions
-        conditions = self.trial_conditions
+    def n_trials(self) -> int:
+        """Total number of trials in the session, bonus trials included."""
+        return len(self.base_conditions) + int(np.count_nonzero(self.bonus_offsets))
 
-        # insert bonus trials for test sessions
-        if self.session_type == "testing":
-            conditions = self._add_bonus_trials(conditions)
+    @staticmethod
+    def _options_for_conditions(conditions: np.ndarray):
+        """Option pair (before left/right shuffling) for each condition."""
+        # regular trials: the two options of the set other than the PMT one
+        position = conditions % 3
+        set_start = conditions - position
+        option_a = set_start + (position == 0)
+        option_b = set_start + 2 - (position == 2)
+
+        # bonus trials: the shape option against its +/- Delta bonus option
+        is_plus = (conditions >= 12) & (conditions < 24)
+        is_minus = conditions >= 24
+        option_a = np.where(is_plus, conditions - 12, option_a)
+        option_a = np.where(is_minus, conditions - 24, option_a)
+        option_b = np.where(conditions >= 12, conditions, option_b)
+
+        return option_a, option_b
+
+    def generate_batch(self, n_sequences: int, rng=None) -> np.ndarray:
+        """
+        Generates n_sequences independent trial sequences for this session
+        type at once. Returns a structured array of shape
+        (n_sequences, n_trials) with fields of `trial_dtype`.
+        Draws from the global np.random state unless rng is given.
+        """
+        rng = np.random if rng is None else rng
+        n_base = len(self.base_conditions)
+
+        # shuffle all sequences at once by sorting random keys
+        order = np.argsort(rng.random((n_sequences, n_base)), axis=1)
+        base_conditions = self.base_conditions[order]
+        bonus_offsets = self.bonus_offsets[order]
+
+        # each bonus trial goes right after its regular trial
+        has_bonus = bonus_offsets > 0
+        n_inserted_before = np.cumsum(has_bonus, axis=1) - has_bonus
+        base_positions = np.arange(n_base) + n_inserted_before
+
+        rows = np.arange(n_sequences)[:, None]
+        conditions = np.empty((n_sequences, self.n_trials), dtype=int)
+        conditions[rows, base_positions] = base_conditions
+        bonus_rows, bonus_cols = np.nonzero(has_bonus)
+        conditions[bonus_rows, base_positions[bonus_rows, bonus_cols] + 1] = (
+            base_conditions[bonus_rows, bonus_cols]
+            + bonus_offsets[bonus_rows, bonus_cols]
+        )
+
+        # option pairs in random left/right order
+        option_a, option_b = self._options_for_conditions(conditions)
+        swap = rng.random(conditions.shape) < 0.5
+
+        sequences = np.empty(conditions.shape, dtype=trial_dtype)
+        sequences["Condition"] = conditions
+        sequences["option_a"] = np.where(swap, option_b, option_a)
+        sequences["option_b"] = np.where(swap, option_a, option_b)
+        sequences["bonus_trial"] = conditions > 11
+
+        return sequences
+
+    def generate_array(self, rng=None) -> np.ndarray:
+        """Generates one trial sequence as a structured array."""
+        return self.generate_batch(1, rng=rng)[0]
+
+    def validate(self, sequences: np.ndarray) -> None:
+        """
+        Audits generated sequences (single or batched): checks condition
+        counts, option pairs, and that each bonus trial directly follows
+        a regular trial with the same shape option.
+        """
+        sequences = np.atleast_2d(sequences)
+        conditions = sequences["Condition"].astype(int)
+        assert conditions.shape[1] == self.n_trials, "Wrong number of trials!"
+
+        has_bonus = self.bonus_offsets > 0
+        expected_counts = np.bincount(self.base_conditions, minlength=36)
+        expected_counts += np.bincount(
+            (self.base_conditions + self.bonus_offsets)[has_bonus], minlength=36
+        )
+        for sequence in conditions:
+            assert np.array_equal(
+                np.bincount(sequence, minlength=36), expected_counts
+            ), "Condition counts differ from the session design!"
+
+        option_a, option_b = self._options_for_conditions(conditions)
+        assert np.array_equal(
+            np.sort([sequences["option_a"], sequences["option_b"]], axis=0),
+            np.sort([option_a, option_b], axis=0),
+        ), "Option pairs do not match trial conditions!"
+        assert np.array_equal(sequences["bonus_trial"], conditions > 11)
 
-        return conditions
+        rows, cols = np.nonzero(conditions > 11)
+        assert np.all(cols > 0), "Session starts with a bonus trial!"
+        assert np.array_equal(
+            conditions[rows, cols - 1], conditions[rows, cols] % 12
+        ), "Bonus trial does not follow its regular trial!"
 
-    def _conditions_dict(self, condition):
-        choice_options = self._get_options_for_condition(condition)
-        condition_dict_row = {
-            "Condition": condition,
-            "option_a": choice_options[0],
-            "option_b": choice_options[1],
-        }
-        return condition_dict_row
+    def generate(self, rng=None):
+        """Trial sequence as a list of condition dictionaries."""
+        return self.to_conditions(self.generate_array(rng=rng))
 
-    def generate(self):
-        trial_sequence = list(map(self._conditions_dict, self.condition_sequence))
+    @staticmethod
+    def to_conditions(sequence: np.ndarray):
+        """Condition dictionaries of a generated trial_dtype sequence."""
+        trial_sequence = [
+            {
+                "Condition": int(trial["Condition"]),
+                "option_a": int(trial["option_a"]),
+                "option_b": int(trial["option_b"]),
+            }
+            for trial in sequence
+        ]
         return trial_sequence
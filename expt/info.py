@@ -1,7 +1,7 @@
 from pathlib import Path
 from psychopy import core, data, gui
-import random
 import numpy as np
+from expt.subjects import SubjectStore
 
 
 def display_config_window() -> gui.Dlg:
@@ -13,6 +13,9 @@ def display_config_window() -> gui.Dlg:
     # dialog.addText("Subject Settings")
     dialog.addField("Subject ID")
     dialog.addField("Day")
+    dialog.addField("Resume", choices=["No", "Yes"])
+    dialog.addField("Stratify rewards", choices=["No", "Yes"])
+    dialog.addField("Input", choices=["keyboard", "event"])
     # dialog.addText("Session Settings")
     # dialog.addField("Session ID")
     # dialog.addField("Session Type", choices=["practice", "training", "testing"])
@@ -31,10 +34,16 @@ def display_config_window() -> gui.Dlg:
 def get_config_info(dialog_window) -> dict:
     """
     Extracts information input by user into the gui into a dictionary.
+    "Resume" is whether to resume the day from its last checkpoint, and
+    "Stratify rewards" whether to stratify each option's reward noise,
+    and "Input" the name of the input backend (see expt.input.input_backends).
     """
     experiment_info = {
         "Subject ID": int(dialog_window[0]),
         "Day": int(dialog_window[1]),
+        "Resume": dialog_window[2] == "Yes",
+        "Stratify rewards": dialog_window[3] == "Yes",
+        "Input": dialog_window[4],
         # "Session ID": dialog_window[1],
         # "Session type": dialog_window[2],
     }
@@ -44,34 +53,37 @@ def get_config_info(dialog_window) -> dict:
 
     return experiment_info
 
-def set_random_seed(experiment_info: dict) -> None:
-    # set seeds for experiment subject (random) and session (np.random)
-    subject_seed = experiment_info["Subject ID"]
-    session_seed = experiment_info["Session ID"] + 10 * subject_seed
-    testing_seed = int(experiment_info["Session type"] == "testing") * 1000
+def set_file_path(experiment_info: dict, data_dir: str = "./data") -> str:
+    Path(data_dir).mkdir(parents=True, exist_ok=True)
+    filename = "subject_{}_day_{}_{}_session_{}_{}".format(*experiment_info.values())
+    return str(Path(data_dir) / filename)
 
-    random.seed(subject_seed)
-    np.random.seed(session_seed + testing_seed)
 
-
-def set_file_path(experiment_info: dict) -> str:
-    Path("./data").mkdir(parents=True, exist_ok=True)
-    filename = "data/subject_{}_day_{}_{}_session_{}_{}".format(*experiment_info.values())
-    return filename
+def save_subject_delta_pmt(
+    delta_pmt: float, subject_id: int, subject_store: SubjectStore = None, **session
+) -> None:
+    """Records delta_pmt, optionally with its day, session_type and session_id."""
+    subject_store = SubjectStore() if subject_store is None else subject_store
+    subject_store.record_delta_pmt(subject_id, delta_pmt, **session)
+    return
 
 
-def save_subject_delta_pmt(delta_pmt: float, subject_id: int) -> None:
-    Path("./data").mkdir(parents=True, exist_ok=True)
-    with open(f"./data/subj_{subject_id}.npy", "wb") as f:
-        np.save(f, delta_pmt)
-    return
+def load_subject_delta_pmt(
+    subject_id: int, subject_store: SubjectStore = None, data_dir: str = "./data"
+) -> float:
+    """
+    Latest delta_pmt of a subject. A delta_pmt saved in a subj_{id}.npy
+    file in data_dir before the subject store existed is moved into the store.
+    """
+    subject_store = SubjectStore() if subject_store is None else subject_store
+    delta_pmt = subject_store.latest_delta_pmt(subject_id)
 
+    legacy_path = Path(data_dir) / f"subj_{subject_id}.npy"
+    if (delta_pmt is None) and legacy_path.exists():
+        delta_pmt = float(np.load(legacy_path))
+        subject_store.record_delta_pmt(subject_id, delta_pmt)
 
-def load_subject_delta_pmt(subject_id: int) -> float:
-    try:
-        with open(f"./data/subj_{subject_id}.npy", "rb") as f:
-            delta_pmt = np.load(f)
-    except FileNotFoundError:
+    if delta_pmt is None:
         print(
             "\nTest sessions must start with session id = 0 "
             "to ensure adaptive testing for each subject!\n"
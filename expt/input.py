@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Iterable, List, Tuple
+from psychopy import core, event, visual
+from psychopy.hardware import keyboard
+
+
+@dataclass
+class InputBackend(ABC):
+    """
+    Non-blocking response collection. start() clears queued keys and
+    times responses from the next flip (the choice onset); poll() returns
+    the (key, rt) pairs received since the last poll without waiting, so
+    the frame loop keeps flipping while the subject decides.
+    """
+
+    key_list: list = field(default_factory=lambda: ["left", "right", "escape"])
+
+    @abstractmethod
+    def start(self, win: visual.Window) -> None:
+        pass
+
+    @abstractmethod
+    def _get_keys(self, key_list) -> List[Tuple[str, float]]:
+        pass
+
+    def poll(self) -> List[Tuple[str, float]]:
+        return self._get_keys(self.key_list)
+
+    def wait_keys(self, win: visual.Window, key_list: list = None) -> str:
+        """
+        Keeps the drawn screen up until a key in key_list (any key if
+        None) is pressed, e.g. on instruction screens. Returns the key.
+        """
+        self.start(win)
+        while True:
+            win.flip(clearBuffer=False)
+            keys = self._get_keys(key_list)
+            if keys:
+                return keys[0][0]
+
+
+@dataclass
+class KeyboardInput(InputBackend):
+    """
+    Psychtoolbox keyboard queue. Keys are collected by a background
+    thread and timestamped by the press event itself, not by the poll.
+    """
+
+    def __post_init__(self):
+        self.keyboard = keyboard.Keyboard()
+
+    def start(self, win: visual.Window) -> None:
+        self.keyboard.clearEvents()
+        win.callOnFlip(self.keyboard.clock.reset)
+
+    def _get_keys(self, key_list) -> List[Tuple[str, float]]:
+        keys = self.keyboard.getKeys(keyList=key_list, waitRelease=False)
+        return [(key.name, key.rt) for key in keys]
+
+
+@dataclass
+class EventInput(InputBackend):
+    """
+    Legacy psychopy event module. Keys carry no hardware timestamp: they
+    are stamped when pyglet dispatches the window's events, which happens
+    when they are polled once per frame. RTs are therefore late by up to
+    a frame (plus OS event latency); use KeyboardInput when RTs matter.
+    """
+
+    clock: core.Clock = field(default_factory=core.Clock)
+
+    def start(self, win: visual.Window) -> None:
+        event.clearEvents(eventType="keyboard")
+        win.callOnFlip(self.clock.reset)
+
+    def _get_keys(self, key_list) -> List[Tuple[str, float]]:
+        keys = event.getKeys(keyList=key_list, timeStamped=self.clock)
+        return [(key, rt) for key, rt in keys]
+
+
+@dataclass
+class ScriptedInput(InputBackend):
+    """
+    Fake backend for tests: answers each trial with the next scripted
+    (key, rt) pair once rt seconds have passed since the choice onset.
+    Trials beyond the script are answered with the default response.
+    Screens waiting for a key are passed after screen_time seconds.
+    """
+
+    responses: Iterable[Tuple[str, float]] = ()
+    default_response: Tuple[str, float] = ("left", 0.1)
+    screen_time: float = 0.5
+    clock: core.Clock = field(default_factory=core.Clock)
+
+    def __post_init__(self):
+        self._responses = iter(self.responses)
+        self._pending = None
+
+    def start(self, win: visual.Window) -> None:
+        self._pending = next(self._responses, self.default_response)
+        win.callOnFlip(self.clock.reset)
+
+    def _get_keys(self, key_list) -> List[Tuple[str, float]]:
+        if (self._pending is None) or (self.clock.getTime() < self._pending[1]):
+            return []
+        response, self._pending = self._pending, None
+        return [response]
+
+    def wait_keys(self, win: visual.Window, key_list: list = None) -> str:
+        self.clock.reset()
+        while self.clock.getTime() < self.screen_time:
+            win.flip(clearBuffer=False)
+        return "space" if key_list is None else key_list[0]
+
+
+# backends that can be chosen in the config dialog, by name
+input_backends = {
+    "keyboard": KeyboardInput,
+    "event": EventInput,
+    "scripted": ScriptedInput,
+}
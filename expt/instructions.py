@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from psychopy import visual, event
+from expt.input import InputBackend
 import numpy as np
 
 @dataclass
@@ -10,21 +11,34 @@ class ScreenText:
     # condition: dict
     win: visual.Window
     message: str
+    input_backend: InputBackend = None
+
+    def __post_init__(self):
+        self._text_stim = None
+
+    def text_stim(self) -> visual.TextStim:
+        """The screen's text, created once and drawn on every show."""
+        if self._text_stim is None:
+            self._text_stim = visual.TextStim(
+                self.win,
+                text=self.message,
+                height=0.075,
+                units="height",
+                wrapWidth=1.25,
+            )
+        return self._text_stim
 
     def show(self):
         # display instructions and wait
-        message1 = visual.TextStim(
-            self.win,
-            text=self.message,
-            height=0.075,
-            units="height",
-            wrapWidth=1.25,
-        )
+        message1 = self.text_stim()
         message1.draw()
         self.win.flip()  # to show our newly drawn 'stimuli'
 
         # pause until there's a keypress
-        _ = event.waitKeys()
+        if self.input_backend is None:
+            _ = event.waitKeys()
+        else:
+            _ = self.input_backend.wait_keys(self.win)
         self.win.flip()
 
 
@@ -45,39 +59,66 @@ class EndOfExperimentDayScreen(ScreenText):
 
 @dataclass
 class TotalEarningsScreen:
+    """
+    Show up fee, payoffs of the selected trials and total earnings. The
+    stimuli are created once, for up to max_payoffs payoffs, and only
+    their amounts change with the payoff_list shown.
+    """
+
     win: visual.Window
-    payoff_list: list
-    
+    payoff_list: list = field(default_factory=list)
+    input_backend: InputBackend = None
+    max_payoffs: int = 5
+
+    def __post_init__(self):
+        self._fixed_stims = None
+
     def _create_text_stims(self):
         
         kwargs = {"win":self.win, "height":0.03, "units":"height"}
         y = np.arange(30, -40, -6)/100
-        text_stims = []
 
         # show up fee
-        text_stims += [visual.TextStim(text=f"Show up fee", pos=(-0.2, 0.36), **kwargs)]
-        text_stims += [visual.TextStim(text="$25.0", pos=(0.2, 0.36), **kwargs)]
+        self._fixed_stims = [visual.TextStim(text=f"Show up fee", pos=(-0.2, 0.36), **kwargs)]
+        self._fixed_stims += [visual.TextStim(text="$25.0", pos=(0.2, 0.36), **kwargs)]
 
         # session payoffs
-        for idx, payoff in enumerate(self.payoff_list):
-            text_stims += [visual.TextStim(text=f"Selected trial {idx+1}", pos=(-0.2, y[idx]), **kwargs)]
-            text_stims += [visual.TextStim(text=f"${round(payoff, ndigits=1)}", pos=(0.2, y[idx]), **kwargs)]
+        self._payoff_stims = []
+        for idx in range(self.max_payoffs):
+            self._payoff_stims += [(
+                visual.TextStim(text=f"Selected trial {idx+1}", pos=(-0.2, y[idx]), **kwargs),
+                visual.TextStim(text="$0.0", pos=(0.2, y[idx]), **kwargs),
+            )]
 
         # totals
-        total = round(25 + sum(self.payoff_list), 1)
         kwargs["height"] = 0.04
-        text_stims += [visual.TextStim(text=f"Total", pos=(-0.2, -0.06), **kwargs)]
-        text_stims += [visual.TextStim(text=f"${total}", pos=(0.2, -0.06), **kwargs)]
+        self._fixed_stims += [visual.TextStim(text=f"Total", pos=(-0.2, -0.06), **kwargs)]
+        self._total_stim = visual.TextStim(text="$25.0", pos=(0.2, -0.06), **kwargs)
         
-        text_stims += [visual.TextStim(text="Press space to end experiment", pos=(0, -0.3), **kwargs)]
+        self._fixed_stims += [visual.TextStim(text="Press space to end experiment", pos=(0, -0.3), **kwargs)]
+
+        self._fixed_stims += [visual.Line(win=self.win, start=(0.3, -0.03), end=(-0.3, -0.03), lineWidth=0.05, color="beige", units="height")]
+
+    def text_stims(self) -> list:
+        """Stimuli showing the current payoff_list."""
+        assert len(self.payoff_list) <= self.max_payoffs
+        if self._fixed_stims is None:
+            self._create_text_stims()
 
-        text_stims += [visual.Line(win=self.win, start=(0.3, -0.03), end=(-0.3, -0.03), lineWidth=0.05, color="beige", units="height")]
+        text_stims = list(self._fixed_stims)
+        for (label, amount), payoff in zip(self._payoff_stims, self.payoff_list):
+            amount.text = f"${round(payoff, ndigits=1)}"
+            text_stims += [label, amount]
 
-        return text_stims
+        self._total_stim.text = f"${round(25 + sum(self.payoff_list), 1)}"
+        return text_stims + [self._total_stim]
 
     def show(self):
-        text_stims = self._create_text_stims()
+        text_stims = self.text_stims()
         for text_stim in text_stims:
             text_stim.draw()
         self.win.flip()
-        event.waitKeys(keyList=["space"])
\ No newline at end of file
+        if self.input_backend is None:
+            event.waitKeys(keyList=["space"])
+        else:
+            self.input_backend.wait_keys(self.win, key_list=["space"])
\ No newline at end of file
@@ -0,0 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import re
+import numpy as np
+import pandas as pd
+
+# bump when parsing changes so cached data is parsed again
+loader_cache_version = 2
+
+# session csv names written by expt.info.set_file_path
+file_name_pattern = re.compile(
+    r"subject_(?P<subject_id>\d+)_day_(?P<day>\d+)_(?P<session_type>[a-z]+)"
+    r"_session_(?P<session_id>\d+)_(?P<date_time>.+)\.csv$"
+)
+
+# types of the session csv columns; other columns are inferred
+column_dtypes = {
+    "Subject ID": "Int32",
+    "Day": "Int8",
+    "Session type": "category",
+    "Session ID": "Int8",
+    "DateTime": "string",
+    "trial_index": "Int16",
+    "Condition": "Int16",
+    "option_a": "Int16",
+    "option_b": "Int16",
+    "response": "category",
+    "reaction_time": "float64",
+    "correct": "boolean",
+    "reward": "float64",
+    "bonus_trial": "boolean",
+    "delta_pmt": "float64",
+    "stratify_rewards": "boolean",
+    "adaptive_method": "category",
+}
+
+
+def scan_data_dir(data_dir: str) -> pd.DataFrame:
+    """Manifest of the session csvs in a directory: path, mtime, size and key."""
+    entries = []
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            match = file_name_pattern.match(entry.name)
+            if (match is None) or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append(
+                {
+                    "path": entry.path,
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    **match.groupdict(),
+                }
+            )
+
+    manifest = pd.DataFrame(
+        entries,
+        columns=["path", "mtime", "size", "subject_id", "day", "session_type", "session_id", "date_time"],
+    )
+    return manifest.astype({"subject_id": int, "day": int, "session_id": int})
+
+
+def read_session_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype=column_dtypes)
+    df["path"] = path
+    return df
+
+
+@dataclass
+class DataLoader:
+    """
+    Loads all session csvs of a data directory into one data frame.
+    Parsed data and a manifest of the files it came from are cached, so
+    a load only parses the files that are new or changed since the last
+    one (in parallel) and concatenates once.
+    """
+
+    data_dir: str = "./data"
+    cache_dir: str = None
+    n_workers: int = None
+
+    def __post_init__(self):
+        if self.cache_dir is None:
+            self.cache_dir = os.path.join(self.data_dir, "cache")
+        self.manifest_path = Path(self.cache_dir) / "manifest.pkl"
+        self.data_path = Path(self.cache_dir) / "sessions.pkl"
+
+    def _read_cache(self):
+        try:
+            cache = pd.read_pickle(self.manifest_path)
+            if cache["version"] != loader_cache_version:
+                raise ValueError
+            return cache["manifest"], pd.read_pickle(self.data_path)
+        except (FileNotFoundError, KeyError, ValueError):
+            return None, None
+
+    def _write_cache(self, manifest: pd.DataFrame, df: pd.DataFrame) -> None:
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        df.to_pickle(self.data_path)
+        pd.to_pickle(
+            {"version": loader_cache_version, "manifest": manifest}, self.manifest_path
+        )
+
+    def load(self) -> pd.DataFrame:
+        manifest = scan_data_dir(self.data_dir)
+        cached_manifest, cached_df = self._read_cache()
+
+        # files whose path, mtime and size are unchanged are taken from the cache
+        if cached_manifest is None:
+            unchanged = np.zeros(len(manifest), dtype=bool)
+        else:
+            unchanged = (
+                manifest[["path", "mtime", "size"]]
+                .merge(cached_manifest[["path", "mtime", "size"]], how="left", indicator=True)
+                ["_merge"]
+                .eq("both")
+                .to_numpy()
+            )
+        new_paths = manifest.loc[~unchanged, "path"].tolist()
+        if (cached_manifest is not None) and not new_paths and (
+            len(manifest) == len(cached_manifest)
+        ):
+            return cached_df
+
+        frames = []
+        if cached_df is not None:
+            kept_paths = manifest.loc[unchanged, "path"]
+            frames.append(cached_df[cached_df["path"].isin(kept_paths)])
+
+        n_workers = os.cpu_count() if self.n_workers is None else self.n_workers
+        if new_paths:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                frames += list(executor.map(read_session_csv, new_paths, chunksize=64))
+
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        # categories differ between files, so they are merged after concatenating
+        categorical = [c for c, dtype in column_dtypes.items() if dtype == "category"]
+        df = df.astype({column: "category" for column in categorical if column in df})
+        self._write_cache(manifest, df)
+        return df
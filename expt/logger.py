@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+import json
+import os
+import queue
+import threading
+import numpy as np
+import pandas as pd
+
+
+def _to_builtin(value):
+    # numpy scalars (e.g. np.bool_) are not json serializable
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value)} is not json serializable")
+
+
+@dataclass
+class TrialLogger:
+    """
+    Append-only log of one json record per trial. Records are written by
+    a background thread, so disk latency never reaches the frame loop,
+    and synced to disk every fsync_every records or after fsync_interval
+    seconds without new records. At most the unsynced records are lost
+    in a crash; a last line cut off by a crash is removed when the log is
+    opened again (e.g. on resume) and skipped by read_log. Tasks queued
+    with after_sync run on the same thread once the records logged before
+    them are on disk (e.g. saving a checkpoint); a failing task is
+    reported and logging goes on. If writing the log itself fails, the
+    error is raised by the next call to log or close.
+    """
+
+    file_path: str
+    fsync_every: int = 10
+    fsync_interval: float = 1.0
+
+    def __post_init__(self):
+        self._queue = queue.Queue()
+        self._error = None
+        self._truncate_partial_line()
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run_writer, daemon=True)
+        self._thread.start()
+
+    def _truncate_partial_line(self) -> None:
+        """Cuts an existing log back to its last complete record."""
+        if not os.path.exists(self.file_path):
+            return
+
+        with open(self.file_path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Writing {self.file_path} failed!") from self._error
+
+    def log(self, record: dict) -> None:
+        """Queues a record to be written."""
+        self._raise_error()
+        self._queue.put(record)
+
+    def after_sync(self, task) -> None:
+        """Queues a task to run once all records logged so far are synced."""
+        self._raise_error()
+        self._queue.put(task)
+
+    def close(self) -> None:
+        """Writes and syncs all queued records, then closes the log."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._raise_error()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _run_writer(self) -> None:
+        # keep the error for the experiment thread instead of dying quietly
+        try:
+            self._write_records()
+        except Exception as error:
+            self._error = error
+
+    def _run_task(self, task) -> None:
+        try:
+            task()
+        except Exception as error:
+            print(f"\nTask after syncing {self.file_path} failed: {error!r}\n")
+
+    def _write_records(self) -> None:
+        n_unsynced = 0
+        while True:
+            try:
+                record = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                if n_unsynced > 0:
+                    self._sync()
+                    n_unsynced = 0
+                continue
+
+            if record is None:
+                break
+
+            if callable(record):
+                self._sync()
+                n_unsynced = 0
+                self._run_task(record)
+                continue
+
+            self._file.write(json.dumps(record, default=_to_builtin) + "\n")
+            n_unsynced += 1
+            if n_unsynced >= self.fsync_every:
+                self._sync()
+                n_unsynced = 0
+
+        self._sync()
+
+
+def read_log(file_path) -> pd.DataFrame:
+    """Records of a trial log, skipping any line cut off by a crash."""
+    records = []
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return pd.DataFrame(records)
+
+
+def rebuild_csv(log_path, csv_path) -> pd.DataFrame:
+    """
+    Writes the session csv from its trial log. A trial that was run again
+    after resuming a session replaces its earlier record.
+    """
+    df = read_log(log_path)
+    if "trial_index" in df:
+        df = df.drop_duplicates("trial_index", keep="last")
+    df.to_csv(csv_path, index=False)
+    return df
@@ -0,0 +1,319 @@
+from dataclasses import dataclass
+import random
+from typing import List
+import numpy as np
+from expt.quest import QuestDelta
+from expt.rng import counter_generator, philox_key
+
+
+# shapes making up each of the four option sets
+stim_sets = {
+    "set1": ["heptagon", "triangle", "cross"],
+    "set2": ["rectangle", "circle", "star"],
+    "set3": ["diamond", "pentagon", "oval"],
+    "set4": ["hexagon", "plus", "pacman"],
+}
+
+
+@dataclass
+class OptionModel:
+    """Reward distribution of a choice option, without any stimulus."""
+
+    meanReward: float
+    stdReward: float = 1
+    name: str = None
+
+    def generate_reward(self, rng=None):
+        rng = np.random if rng is None else rng
+        r = rng.normal(self.meanReward, self.stdReward)
+        return r
+
+
+def shuffle(items: list, rng=None) -> None:
+    """Shuffles a list in place, with the global random state unless rng is given."""
+    if rng is None:
+        random.shuffle(items)
+    else:
+        items[:] = [items[i] for i in rng.permutation(len(items))]
+
+
+@dataclass
+class OptionSetModel:
+    """
+    A set of 3 options with specific stakes,
+    relative frequency of occurance, and color.
+    """
+
+    stakes: float
+    freq: int
+    color: str
+    setN: str
+    meanReward: float = 10
+    rng: np.random.Generator = None
+
+    def __post_init__(self):
+        assert self.setN in ["set1", "set2", "set3", "set4"]
+
+        # shapes are assigned to the rewards of the set in random order
+        self.shape_names = list(stim_sets[self.setN])
+        shuffle(self.shape_names, self.rng)
+
+        rewards = [
+            self.meanReward + self.stakes,
+            self.meanReward,
+            self.meanReward - self.stakes,
+        ]
+
+        self.options = []
+        for shape_name, reward in zip(self.shape_names, rewards):
+            self.options.append(
+                OptionModel(meanReward=reward, name=f"{self.color}-{shape_name}")
+            )
+
+
+@dataclass
+class SubjectOptionModel:
+    """
+    Window-free model of the regular shape-based and bonus choice
+    options for a given subject: option set assignment, reward
+    means and SDs, and the adaptive bonus delta. delta_pmt is adapted
+    with a weighted staircase ("staircase") or QUEST+ ("quest").
+    Given a subject_id, the assignment is drawn from the subject's own
+    counter-based stream and is the same whenever it is recreated.
+    """
+
+    delta_pmt: float = 4
+    adaptive_method: str = "staircase"
+    subject_id: int = None
+    set_names = ["set1", "set2", "set3", "set4"]
+    colors = [(0.4, 0.4, 0.4), (0.8, 0.25, -1), (-0.33, 0.41, 0.83), (-1, 0.24, -0.1)]
+    stakes = [4, 1, 4, 1]
+    freqs = [4, 4, 1, 1]
+
+    # parameters for adaptive setting of delta_pmt
+    a = 0.16
+    b = 0.84
+    decay = 1
+    decay_schedule = "linear"
+    counter = 0
+    n_adaptive_trials = 20
+
+    def __post_init__(self):
+        """Creates all shape-based options and bonus options"""
+        assert self.adaptive_method in ["staircase", "quest"]
+        if self.adaptive_method == "quest":
+            self.quest = QuestDelta(p_target=self.b / (self.a + self.b))
+
+        rng = None
+        if self.subject_id is not None:
+            rng = counter_generator(philox_key(self.subject_id), stream="options")
+
+        # shuffle the sets and colors
+        self.set_names = list(self.set_names)
+        self.colors = list(self.colors)
+        shuffle(self.set_names, rng)
+        shuffle(self.colors, rng)
+
+        # Create 4 sets of 3 options each
+        self.option_sets = []
+        self.shape_options = []
+        for setN, color, stake, freq in zip(
+            self.set_names, self.colors, self.stakes, self.freqs
+        ):
+            option_set = OptionSetModel(
+                setN=setN, color=color, stakes=stake, freq=freq, rng=rng
+            )
+            self.option_sets.append(option_set)
+            self.shape_options += option_set.options
+
+        # Bonus choice options (as numbers shown on screen)
+        self.good_bonus_options = []
+        self.bad_bonus_options = []
+        for option in self.shape_options:
+            self.good_bonus_options.append(
+                OptionModel(meanReward=(option.meanReward + self.delta_pmt), stdReward=0)
+            )
+            self.bad_bonus_options.append(
+                OptionModel(meanReward=(option.meanReward - self.delta_pmt), stdReward=0)
+            )
+
+        self.all_options = (
+            self.shape_options + self.good_bonus_options + self.bad_bonus_options
+        )
+        return
+
+    @property
+    def mean_rewards(self) -> np.ndarray:
+        """Mean reward of all 36 options, indexed by option id."""
+        return np.array([option.meanReward for option in self.all_options], dtype=float)
+
+    def update_bonus_options(self, change_in_delta=0, new_delta_pmt=None) -> float:
+        if (new_delta_pmt is not None) & (change_in_delta == 0):
+            change_in_delta = new_delta_pmt - self.delta_pmt
+
+        for option in self.good_bonus_options:
+            option.meanReward += change_in_delta
+
+        for option in self.bad_bonus_options:
+            option.meanReward -= change_in_delta
+
+        self.delta_pmt += change_in_delta
+        return self.delta_pmt
+
+    def adaptive_state(self) -> dict:
+        """State of the adaptive procedure, e.g. to checkpoint a session."""
+        state = {
+            "delta_pmt": float(self.delta_pmt),
+            "counter": self.counter,
+            "decay": self.decay,
+            "bonus_rewards": [
+                float(option.meanReward)
+                for option in self.good_bonus_options + self.bad_bonus_options
+            ],
+        }
+        if self.adaptive_method == "quest":
+            state["posterior"] = self.quest.posterior.tolist()
+        return state
+
+    def restore_adaptive_state(self, state: dict) -> None:
+        """Restores exactly the state saved by adaptive_state."""
+        self.delta_pmt = state["delta_pmt"]
+        self.counter = state["counter"]
+        self.decay = state["decay"]
+        for option, reward in zip(
+            self.good_bonus_options + self.bad_bonus_options, state["bonus_rewards"]
+        ):
+            option.meanReward = reward
+        if self.adaptive_method == "quest":
+            self.quest.posterior = np.array(state["posterior"])
+
+    def adapt_delta(self, correct) -> float:
+        self.counter += 1
+
+        if self.adaptive_method == "quest":
+            return self._adapt_delta_quest(correct)
+
+        # step size decays over the adaptive trials
+        self.decay = float(
+            decay_factor(self.counter, self.n_adaptive_trials, self.decay_schedule)
+        )
+
+        # continuous adaptive setting
+        change_in_delta = float(
+            delta_step(
+                self.counter,
+                correct,
+                self.a,
+                self.b,
+                self.n_adaptive_trials,
+                self.decay_schedule,
+            )
+        )
+
+        # reset mean reward of bonus options and delta_pmt
+        return self.update_bonus_options(change_in_delta)
+
+    def _adapt_delta_quest(self, correct) -> float:
+        # delta_pmt is fixed after the adaptive trials, as for the staircase
+        if self.counter > self.n_adaptive_trials:
+            return self.delta_pmt
+
+        # present the most informative delta next, and the
+        # threshold estimate once the adaptive trials are done
+        self.quest.update(self.delta_pmt, correct)
+        if self.counter < self.n_adaptive_trials:
+            new_delta_pmt = self.quest.next_delta()
+        else:
+            new_delta_pmt = self.quest.estimate()
+
+        return self.update_bonus_options(new_delta_pmt=new_delta_pmt)
+
+
+def decay_factor(counter, n_adaptive_trials=20, schedule="linear"):
+    """
+    Step size multiplier after the counter-th adaptive bonus trial.
+    "linear": constant for the first half of the adaptive trials, then
+    decays linearly to zero; "exponential": halves every quarter of the
+    adaptive trials after the first half; "none": constant.
+    """
+    counter = np.asarray(counter)
+    second_half = counter > n_adaptive_trials / 2
+    if schedule == "linear":
+        decay = np.maximum(2 * (1 - counter / n_adaptive_trials), 0)
+    elif schedule == "exponential":
+        decay = 0.5 ** ((counter - n_adaptive_trials / 2) / (n_adaptive_trials / 4))
+    elif schedule == "none":
+        decay = np.ones(counter.shape)
+    else:
+        raise ValueError(f"Unknown decay schedule: {schedule}")
+    return np.where(second_half, decay, 1)
+
+
+def delta_step(
+    counter, correct, a=0.16, b=0.84, n_adaptive_trials=20, decay_schedule="linear"
+):
+    """
+    Change in delta_pmt after the counter-th adaptive bonus trial.
+    Works elementwise on arrays of counters and outcomes.
+    """
+    decay = decay_factor(counter, n_adaptive_trials, decay_schedule)
+    return np.where(correct, -a * decay, b * decay)
+
+
+def trial_outcome(trial_choices: List, response: str, rng=None, reward_noise=None):
+    """
+    Whether the response was correct or not and reward obtained,
+    for the two options [left, right] shown on a trial. The reward
+    uses pre-drawn standardized reward_noise if given, or else is
+    drawn from rng (e.g. the trial's counter-based stream).
+    """
+    # mean rewards for both choice options
+    option_rewards = [opt.meanReward for opt in trial_choices]
+
+    # get index of the option with higher reward
+    idx_max_reward = option_rewards.index(max(option_rewards))
+
+    # identify and return correct response
+    responses = ["left", "right"]
+    correct_response = responses[idx_max_reward]
+    outcome_correct = response == correct_response
+
+    # outcome reward
+    chosen_option = trial_choices[responses.index(response)]
+    if reward_noise is None:
+        outcome_reward = chosen_option.generate_reward(rng)
+    else:
+        outcome_reward = chosen_option.meanReward + chosen_option.stdReward * reward_noise
+
+    return outcome_correct, outcome_reward
+
+
+def simulate_trial(
+    all_options: List,
+    condition: dict,
+    response: str = "left",
+    rt: float = 0.1,
+    rng=None,
+    reward_noise=None,
+) -> dict:
+    """
+    Runs one trial without a window or keyboard input.
+    Returns the same trial data as TrialRoutine.run.
+    """
+    trial_choices = [
+        all_options[condition["option_a"]],
+        all_options[condition["option_b"]],
+    ]
+    corr, rew = trial_outcome(
+        trial_choices, response=response, rng=rng, reward_noise=reward_noise
+    )
+
+    trial_data = {
+        "response": response,
+        "reaction_time": rt,
+        "correct": corr,
+        "reward": rew,
+        "bonus_trial": condition["Condition"] > 11,
+    }
+
+    return trial_data
@@ -3,6 +3,7 @@ from dataclasses import dataclass
 import random
 from typing import List
 from psychopy import visual
+from expt.models import SubjectOptionModel
 from expt.stimuli import Stimuli
 import numpy as np
 
@@ -35,10 +36,15 @@ class ChoiceOption(OnScreenObject):
     meanReward: float
     stdReward: float
 
-    def generate_reward(self):
-        r = np.random.normal(self.meanReward, self.stdReward)
+    def generate_reward(self, rng=None):
+        rng = np.random if rng is None else rng
+        r = rng.normal(self.meanReward, self.stdReward)
         return r
 
+    def refresh_text(self) -> None:
+        """Brings displayed text up to date; shapes have none."""
+        pass
+
 
 @dataclass
 class ShapeOption(ChoiceOption):
@@ -52,7 +58,11 @@ class ShapeOption(ChoiceOption):
 
 
 class BonusOption(ChoiceOption):
-    """Numerical bonus choice option for 2AFC task."""
+    """
+    Numerical bonus choice option for 2AFC task. Changing meanReward only
+    marks the text as dirty; it is re-laid out by refresh_text when the
+    option is next shown.
+    """
 
     def __init__(self, win, meanReward):
         self.stdReward: float = 0
@@ -65,7 +75,23 @@ class BonusOption(ChoiceOption):
             height=0.15,
         )
         self.win = win
-        self.meanReward = meanReward
+        self._meanReward = meanReward
+        self._text_dirty = False
+
+    @property
+    def meanReward(self) -> float:
+        return self._meanReward
+
+    @meanReward.setter
+    def meanReward(self, value: float) -> None:
+        if value != self._meanReward:
+            self._meanReward = value
+            self._text_dirty = True
+
+    def refresh_text(self) -> None:
+        if self._text_dirty:
+            self.shape.text = str(np.around(self._meanReward, 1))
+            self._text_dirty = False
 
 
 class FixCross(OnScreenObject):
@@ -159,12 +185,17 @@ class OptionSet:
     color: str
     setN: str
     meanReward: float = 10
+    shape_names: list = None
 
     def __post_init__(self):
         assert self.setN in ["set1", "set2", "set3", "set4"]
 
+        # use the given shape order if it was already assigned
         stimuli = Stimuli(win=self.win, color=self.color, colorSpace="rgb")
-        stimSet = stimuli.get_stim_set(setN=self.setN)
+        if self.shape_names is None:
+            stimSet = stimuli.get_stim_set(setN=self.setN)
+        else:
+            stimSet = stimuli.get_stims(self.shape_names)
 
         rewards = [
             self.meanReward + self.stakes,
@@ -219,86 +250,97 @@ def create_choice_options(win) -> List[ChoiceOption]:
 class SubjectSpecificOptions:
     """
     Regular shape-based and bonus choice options for a given subject.
+    Reward logic lives in the window-free `model`; the psychopy stimuli
+    are only created when the options are first needed for rendering.
     """
 
     win: visual.Window
     delta_pmt: float = 4
-    set_names = ["set1", "set2", "set3", "set4"]
-    colors = [(0.4, 0.4, 0.4), (0.8, 0.25, -1), (-0.33, 0.41, 0.83), (-1, 0.24, -0.1)]
-    stakes = [4, 1, 4, 1]
-    freqs = [4, 4, 1, 1]
-
-    # parameters for adaptive setting of delta_pmt
-    a = 0.16
-    b = 0.84
-    decay = 1
-    counter = 0
-    n_adaptive_trials = 20
+    adaptive_method: str = "staircase"
+    subject_id: int = None
+    model: SubjectOptionModel = None
 
     def __post_init__(self):
-        """Creates all shape-based options and bonus options"""
-        # shuffle the sets and colors
-        random.shuffle(self.set_names)
-        random.shuffle(self.colors)
+        if self.model is None:
+            self.model = SubjectOptionModel(
+                delta_pmt=self.delta_pmt,
+                adaptive_method=self.adaptive_method,
+                subject_id=self.subject_id,
+            )
+        self.delta_pmt = self.model.delta_pmt
+        self._all_options = None
 
+    def _create_stimuli(self) -> None:
+        """Creates psychopy stimuli for all options in the model"""
         # Create 4 sets of 3 options each
-        self.shape_options = []
-        for setN, color, stake, freq in zip(
-            self.set_names, self.colors, self.stakes, self.freqs
-        ):
-            self.shape_options += OptionSet(
-                self.win, setN=setN, color=color, stakes=stake, freq=freq
+        self._shape_options = []
+        for option_set in self.model.option_sets:
+            self._shape_options += OptionSet(
+                self.win,
+                setN=option_set.setN,
+                color=option_set.color,
+                stakes=option_set.stakes,
+                freq=option_set.freq,
+                shape_names=option_set.shape_names,
             ).options
 
         # Bonus choice options (as numbers shown on screen)
-        self.good_bonus_options = []
-        self.bad_bonus_options = []
-        for option in self.shape_options:
-
-            self.good_bonus_options.append(
-                BonusOption(
-                    win=self.win, meanReward=(option.meanReward + self.delta_pmt)
-                )
-            )
-            self.bad_bonus_options.append(
-                BonusOption(
-                    win=self.win, meanReward=(option.meanReward - self.delta_pmt)
-                )
-            )
+        self._good_bonus_options = [
+            BonusOption(win=self.win, meanReward=option.meanReward)
+            for option in self.model.good_bonus_options
+        ]
+        self._bad_bonus_options = [
+            BonusOption(win=self.win, meanReward=option.meanReward)
+            for option in self.model.bad_bonus_options
+        ]
 
-        self.all_options = (
-            self.shape_options + self.good_bonus_options + self.bad_bonus_options
+        self._all_options = (
+            self._shape_options + self._good_bonus_options + self._bad_bonus_options
         )
-        return
-
-    def update_bonus_options(self, change_in_delta=0, new_delta_pmt=None) -> float:
-        if (new_delta_pmt is not None) & (change_in_delta == 0):
-            change_in_delta = new_delta_pmt - self.delta_pmt
-
-        for option in self.good_bonus_options:
-            option.meanReward += change_in_delta
-            option.shape.text = str(np.around(option.meanReward, 1))
-
-        for option in self.bad_bonus_options:
-            option.meanReward -= change_in_delta
-            option.shape.text = str(np.around(option.meanReward, 1))
-        return
 
-    def adapt_delta(self, correct) -> None:
-        self.counter += 1
-
-        # decay for second half of adaptive trials
-        if self.counter > self.n_adaptive_trials / 2:
-            self.decay = max(2 * (1 - self.counter / self.n_adaptive_trials), 0)
+    @property
+    def all_options(self) -> List[ChoiceOption]:
+        if self._all_options is None:
+            self._create_stimuli()
+        return self._all_options
+
+    @property
+    def shape_options(self) -> List[ChoiceOption]:
+        return self.all_options[:12]
+
+    @property
+    def good_bonus_options(self) -> List[ChoiceOption]:
+        return self.all_options[12:24]
+
+    @property
+    def bad_bonus_options(self) -> List[ChoiceOption]:
+        return self.all_options[24:]
+
+    def _sync_bonus_options(self) -> None:
+        """
+        Copies bonus rewards from the model onto existing stimuli. Their
+        text is only updated once they are assigned to a trial.
+        """
+        self.delta_pmt = self.model.delta_pmt
+        if self._all_options is None:
+            return
+
+        model_bonus_options = (
+            self.model.good_bonus_options + self.model.bad_bonus_options
+        )
+        for option, model_option in zip(self._all_options[12:], model_bonus_options):
+            option.meanReward = model_option.meanReward
 
-        # continuous adaptive setting
-        if correct:
-            change_in_delta = -self.a * self.decay
-        else:
-            change_in_delta = self.b * self.decay
+    def update_bonus_options(self, change_in_delta=0, new_delta_pmt=None) -> float:
+        self.model.update_bonus_options(change_in_delta, new_delta_pmt)
+        self._sync_bonus_options()
+        return self.delta_pmt
 
-        # reset mean reward of bonus options and the delta_pmt attribute
-        # in class based on new value of delta_pmt
-        self.delta_pmt += change_in_delta
-        self.update_bonus_options(change_in_delta)
+    def adapt_delta(self, correct) -> float:
+        self.model.adapt_delta(correct)
+        self._sync_bonus_options()
         return self.delta_pmt
+
+    def restore_adaptive_state(self, state: dict) -> None:
+        self.model.restore_adaptive_state(state)
+        self._sync_bonus_options()
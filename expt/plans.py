@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+import json
+from pathlib import Path
+from typing import List
+import numpy as np
+from expt.conditions import TrialSequence, day_sessions
+from expt.models import SubjectOptionModel
+from expt.rewards import RewardSchedule
+from expt.rng import counter_generator, session_key
+
+# bump when the plan file layout or the way plans are drawn changes
+plan_version = 1
+
+
+def option_assignment(model: SubjectOptionModel) -> list:
+    """Set, color, stakes, frequency and shape order of each option set."""
+    return [
+        {
+            "setN": option_set.setN,
+            "color": list(option_set.color),
+            "stakes": option_set.stakes,
+            "freq": option_set.freq,
+            "shape_names": list(option_set.shape_names),
+        }
+        for option_set in model.option_sets
+    ]
+
+
+def plan_path(plan_dir: str, subject_id: int, day: int) -> Path:
+    return Path(plan_dir) / f"subject_{subject_id}_day_{day}.npz"
+
+
+@dataclass
+class SessionPlan:
+    """
+    Everything a session draws at random: its trial sequence (the
+    option_a / option_b pair of a trial is shown left / right), the
+    standardized reward noise of both sides of every trial, and the
+    indices of the two payoff trials.
+    """
+
+    session_type: str
+    session_id: int
+    sequence: np.ndarray
+    reward_noise: np.ndarray
+    payoff_trial_index: np.ndarray
+
+    @property
+    def trial_conditions(self) -> List[dict]:
+        return TrialSequence.to_conditions(self.sequence)
+
+
+@dataclass
+class DayPlan:
+    """
+    A subject's whole experiment day compiled ahead of time from the same
+    counter-based streams the sessions use at runtime, saved as a single
+    versioned .npz file that can be reviewed offline.
+    """
+
+    subject_id: int
+    day: int
+    assignment: list
+    sessions: List[SessionPlan]
+    stratify_rewards: bool = False
+    version: int = plan_version
+
+    @classmethod
+    def compile(cls, subject_id: int, day: int, stratify_rewards: bool = False):
+        model = SubjectOptionModel(subject_id=subject_id)
+
+        sessions = []
+        for session_type, session_id in day_sessions[day]:
+            rng_key = session_key(subject_id, day, session_type, session_id)
+            sequence = TrialSequence(
+                session_type=session_type, session_id=session_id
+            ).generate_array(rng=counter_generator(rng_key, stream="sequence"))
+            reward_schedule = RewardSchedule(
+                TrialSequence.to_conditions(sequence), rng_key, stratify=stratify_rewards
+            )
+            payoff_trial_index = counter_generator(rng_key, stream="payoff").choice(
+                len(sequence), size=2, replace=False
+            )
+            sessions.append(
+                SessionPlan(
+                    session_type=session_type,
+                    session_id=session_id,
+                    sequence=sequence,
+                    reward_noise=reward_schedule.noise,
+                    payoff_trial_index=payoff_trial_index,
+                )
+            )
+
+        return cls(
+            subject_id=subject_id,
+            day=day,
+            assignment=option_assignment(model),
+            sessions=sessions,
+            stratify_rewards=stratify_rewards,
+        )
+
+    def save(self, plan_dir: str = "./data/plans") -> Path:
+        file_path = plan_path(plan_dir, self.subject_id, self.day)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        metadata = {
+            "version": self.version,
+            "subject_id": self.subject_id,
+            "day": self.day,
+            "stratify_rewards": self.stratify_rewards,
+            "assignment": self.assignment,
+            "sessions": [[s.session_type, s.session_id] for s in self.sessions],
+        }
+        arrays = {"metadata": np.array(json.dumps(metadata))}
+        for idx, session in enumerate(self.sessions):
+            arrays[f"sequence_{idx}"] = session.sequence
+            arrays[f"reward_noise_{idx}"] = session.reward_noise
+            arrays[f"payoff_trial_index_{idx}"] = session.payoff_trial_index
+
+        with open(file_path, "wb") as f:
+            np.savez(f, **arrays)
+        return file_path
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as plan_file:
+            metadata = json.loads(str(plan_file["metadata"]))
+            if metadata["version"] != plan_version:
+                raise ValueError(
+                    f"{file_path} is a version {metadata['version']} plan, "
+                    f"recompile it for version {plan_version}!"
+                )
+
+            sessions = [
+                SessionPlan(
+                    session_type=session_type,
+                    session_id=session_id,
+                    sequence=plan_file[f"sequence_{idx}"],
+                    reward_noise=plan_file[f"reward_noise_{idx}"],
+                    payoff_trial_index=plan_file[f"payoff_trial_index_{idx}"],
+                )
+                for idx, (session_type, session_id) in enumerate(metadata["sessions"])
+            ]
+
+        return cls(
+            subject_id=metadata["subject_id"],
+            day=metadata["day"],
+            assignment=metadata["assignment"],
+            sessions=sessions,
+            stratify_rewards=metadata["stratify_rewards"],
+            version=metadata["version"],
+        )
+
+
+def compile_cohort_plans(
+    subject_ids, days=(1, 2), plan_dir: str = "./data/plans", stratify_rewards=False
+) -> List[Path]:
+    """Compiles and saves the plans of every day of every subject."""
+    return [
+        DayPlan.compile(subject_id, day, stratify_rewards=stratify_rewards).save(plan_dir)
+        for subject_id in subject_ids
+        for day in days
+    ]
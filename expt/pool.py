@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+from psychopy import visual
+from expt.atlas import StimulusAtlas
+from expt.options import FeedbackRect, FeedbackText, FixCross, RespondFasterText
+
+
+@dataclass
+class StimulusPool:
+    """
+    Trial stimuli shared by all sessions of a day. Feedback texts are
+    cached by their rounded reward string (least recently used ones are
+    dropped beyond max_feedback_texts), so a TextBox2 is only laid out
+    the first time a reward value is shown. With render_mode "cached",
+    choice options are drawn from pre-rendered images (see StimulusAtlas)
+    instead of as vector shapes and text.
+    """
+
+    win: visual.Window
+    max_feedback_texts: int = 512
+    render_mode: str = "vector"
+
+    def __post_init__(self):
+        assert self.render_mode in ["vector", "cached"]
+        self.atlas = None
+        if self.render_mode == "cached":
+            self.atlas = StimulusAtlas(self.win)
+
+        self.fix_cross = FixCross(self.win)
+        self.feedback_rect = FeedbackRect(self.win)
+        self.respond_faster_text = RespondFasterText(self.win)
+        self._feedback_texts = OrderedDict()
+
+    @staticmethod
+    def _feedback_key(reward: float) -> str:
+        return f"$ {np.around(reward, 1)}"
+
+    def prefetch_feedback(self, rewards) -> None:
+        """Lays out feedback texts for rewards that may be shown next."""
+        for reward in rewards:
+            self._get_feedback_text(reward)
+
+    def _get_feedback_text(self, reward: float) -> FeedbackText:
+        key = self._feedback_key(reward)
+        if key in self._feedback_texts:
+            self._feedback_texts.move_to_end(key)
+        else:
+            self._feedback_texts[key] = FeedbackText(self.win, reward)
+            if len(self._feedback_texts) > self.max_feedback_texts:
+                self._feedback_texts.popitem(last=False)
+        return self._feedback_texts[key]
+
+    def prepare_option(self, option, side: str) -> None:
+        """Brings the option's cached image up to date before it is drawn."""
+        if self.atlas is not None:
+            self.atlas.prepare(option, side)
+
+    def option_stims(self, options) -> list:
+        """
+        (name, stimulus) pairs that are drawn for the options in the
+        active render mode: their shapes, or their images at both sides.
+        """
+        if self.atlas is None:
+            return [(f"option_{i}", option.shape) for i, option in enumerate(options)]
+
+        self.atlas.prerender(options)
+        return [
+            (f"option_{i}_{side}", self.atlas.image(option, side))
+            for i, option in enumerate(options)
+            for side in ["left", "right"]
+        ]
+
+    def draw_option(self, option, side: str) -> None:
+        """Draws a choice option placed at the given side."""
+        if self.atlas is None:
+            option.shape.draw()
+        else:
+            self.atlas.draw(option, side)
+
+    def feedback_text(self, reward: float, pos: str) -> FeedbackText:
+        """Feedback text for a reward, placed on the chosen side."""
+        feedback_text = self._get_feedback_text(reward)
+        feedback_text.set_position(newPos=pos)
+        return feedback_text
@@ -0,0 +1,166 @@
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import stats
+from expt.conditions import TrialSequence
+from expt.simulation import NoisyMemoryPolicy, option_attributes, simulate_choices
+
+
+# bump when the simulation or test changes so cached cells are recomputed
+power_cache_version = 1
+
+
+def bonus_trial_options(n_bonus_trials_per_option: int = 2):
+    """
+    Shape and bonus option ids of the bonus (PMT) trials of one testing
+    session. Their order within the session does not affect accuracy
+    while delta_pmt is fixed, so only the set of trials is needed.
+    """
+    trial_sequence = TrialSequence(
+        session_type="testing",
+        session_id=1,
+        n_bonus_trials_per_option=n_bonus_trials_per_option,
+    )
+    has_bonus = trial_sequence.bonus_offsets > 0
+    shape_options = trial_sequence.base_conditions[has_bonus]
+    bonus_options = shape_options + trial_sequence.bonus_offsets[has_bonus]
+    return shape_options, bonus_options
+
+
+@dataclass
+class PowerAnalysis:
+    """
+    Monte Carlo power of a paired t-test of bonus-trial accuracy between
+    high and low levels of a factor (stakes or freq), for designs with
+    n_subjects subjects and n_sessions testing sessions each. The assumed
+    effect is set through the memory precision of the policy.
+    """
+
+    policy: NoisyMemoryPolicy = field(default_factory=NoisyMemoryPolicy)
+    factor: str = "stakes"
+    delta_pmt: float = 4
+    alpha: float = 0.05
+    ci_half_width: float = 0.02
+    batch_size: int = 100
+    min_cohorts: int = 200
+    max_cohorts: int = 10000
+    seed: int = 0
+    cache_dir: str = "./data/power_cache"
+
+    def __post_init__(self):
+        assert self.factor in ["stakes", "freq"]
+        _, stakes, freqs = option_attributes()
+        levels = stakes if self.factor == "stakes" else freqs
+        self.high_level = levels == max(levels)
+
+    def _cell_key(self, n_subjects: int, n_sessions: int) -> str:
+        """Hash of everything that determines a design cell's result."""
+        settings = {
+            "version": power_cache_version,
+            "policy": type(self.policy).__name__,
+            "policy_params": asdict(self.policy),
+            "factor": self.factor,
+            "delta_pmt": self.delta_pmt,
+            "alpha": self.alpha,
+            "ci_half_width": self.ci_half_width,
+            "batch_size": self.batch_size,
+            "min_cohorts": self.min_cohorts,
+            "max_cohorts": self.max_cohorts,
+            "seed": self.seed,
+            "n_subjects": n_subjects,
+            "n_sessions": n_sessions,
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+    def simulate_p_values(self, n_cohorts, n_subjects, n_sessions, rng) -> np.ndarray:
+        """Simulates n_cohorts cohorts and returns the p-value of each."""
+        shape_options, bonus_options = bonus_trial_options()
+        shape = (n_cohorts, n_subjects, n_sessions * len(shape_options))
+        option_a = np.broadcast_to(np.tile(shape_options, n_sessions), shape)
+        option_b = np.broadcast_to(np.tile(bonus_options, n_sessions), shape)
+        delta_pmt = np.full(n_cohorts * n_subjects, self.delta_pmt)
+
+        outcome = simulate_choices(
+            option_a.reshape(-1, shape[2]),
+            option_b.reshape(-1, shape[2]),
+            delta_pmt,
+            self.policy,
+            rng.random((n_cohorts * n_subjects, shape[2])),
+            np.zeros((n_cohorts * n_subjects, shape[2])),
+        )
+        correct = outcome["correct"].reshape(shape)
+
+        # per subject accuracy difference between factor levels
+        is_high = self.high_level[option_a[0, 0]]
+        difference = correct[..., is_high].mean(axis=-1) - correct[
+            ..., ~is_high
+        ].mean(axis=-1)
+
+        _, p_values = stats.ttest_1samp(difference, 0, axis=-1)
+        return np.nan_to_num(p_values, nan=1)
+
+    def run_cell(self, n_subjects: int, n_sessions: int) -> dict:
+        """
+        Estimates power for one design, simulating batches of cohorts until
+        the 95% Wilson interval of the estimate is narrower than
+        +/- ci_half_width. Finished cells are cached in cache_dir.
+        """
+        cache_file = Path(self.cache_dir) / f"{self._cell_key(n_subjects, n_sessions)}.json"
+        if cache_file.exists():
+            with open(cache_file) as f:
+                return json.load(f)
+
+        # stream specific to the design cell, whichever other cells are run
+        rng = np.random.default_rng(
+            np.random.SeedSequence(self.seed, spawn_key=(n_subjects, n_sessions))
+        )
+
+        n_cohorts, n_significant = 0, 0
+        while n_cohorts < self.max_cohorts:
+            p_values = self.simulate_p_values(self.batch_size, n_subjects, n_sessions, rng)
+            n_cohorts += self.batch_size
+            n_significant += int(np.sum(p_values < self.alpha))
+
+            ci_low, ci_high = wilson_interval(n_significant, n_cohorts)
+            if (n_cohorts >= self.min_cohorts) & (
+                (ci_high - ci_low) / 2 <= self.ci_half_width
+            ):
+                break
+
+        cell = {
+            "n_subjects": n_subjects,
+            "n_sessions": n_sessions,
+            "n_cohorts": n_cohorts,
+            "power": n_significant / n_cohorts,
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+        }
+
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        with open(cache_file, "w") as f:
+            json.dump(cell, f)
+
+        return cell
+
+    def sweep(self, n_subjects_list, n_sessions_list) -> pd.DataFrame:
+        """Power for every combination of numbers of subjects and sessions."""
+        cells = [
+            self.run_cell(n_subjects, n_sessions)
+            for n_subjects in n_subjects_list
+            for n_sessions in n_sessions_list
+        ]
+        return pd.DataFrame(cells)
+
+
+def wilson_interval(n_successes: int, n_trials: int, z: float = 1.96):
+    """Wilson score interval for a binomial proportion."""
+    p_hat = n_successes / n_trials
+    denominator = 1 + z ** 2 / n_trials
+    centre = (p_hat + z ** 2 / (2 * n_trials)) / denominator
+    half_width = (
+        z * np.sqrt(p_hat * (1 - p_hat) / n_trials + z ** 2 / (4 * n_trials ** 2))
+    ) / denominator
+    return centre - half_width, centre + half_width
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+from scipy.special import ndtr, ndtri, xlogy
+
+
+# bonus deltas that can be presented and thresholds that are considered
+delta_domain = tuple(np.round(np.arange(0.1, 8.05, 0.1), 1))
+threshold_domain = tuple(np.round(np.geomspace(0.2, 10, 100), 4))
+
+
+@lru_cache(maxsize=None)
+def likelihood_table(deltas: tuple, thresholds: tuple, lapse_rate: float) -> np.ndarray:
+    """
+    Probability of each response (incorrect, correct) on a bonus trial,
+    shape (n_deltas, n_thresholds, 2). A subject with threshold s is
+    correct with probability lapse / 2 + (1 - lapse) * Phi(delta / s).
+    Cached, so it is only computed once per set of domains.
+    """
+    deltas = np.asarray(deltas)[:, None]
+    thresholds = np.asarray(thresholds)[None, :]
+    p_correct = lapse_rate / 2 + (1 - lapse_rate) * ndtr(deltas / thresholds)
+    table = np.stack([1 - p_correct, p_correct], axis=-1)
+    table.flags.writeable = False
+    return table
+
+
+@dataclass
+class QuestDelta:
+    """
+    QUEST+-style Bayesian adaptive procedure for delta_pmt. Keeps a
+    posterior over the subject's bonus-trial threshold and presents the
+    delta that minimizes the expected posterior entropy.
+    """
+
+    p_target: float = 0.84
+    lapse_rate: float = 0.02
+    deltas: tuple = delta_domain
+    thresholds: tuple = threshold_domain
+
+    def __post_init__(self):
+        self.likelihood = likelihood_table(self.deltas, self.thresholds, self.lapse_rate)
+        self._delta_values = np.asarray(self.deltas)
+        self._log_thresholds = np.log(self.thresholds)
+
+        # flat prior over log threshold
+        self.posterior = np.full(len(self.thresholds), 1 / len(self.thresholds))
+
+    def update(self, delta_pmt: float, correct: bool) -> None:
+        """Bayesian update after a bonus trial shown at delta_pmt."""
+        idx = np.abs(self._delta_values - delta_pmt).argmin()
+        self.posterior = self.posterior * self.likelihood[idx, :, int(correct)]
+        self.posterior /= self.posterior.sum()
+
+    def next_delta(self) -> float:
+        """Delta with the lowest expected posterior entropy."""
+        joint = self.posterior[None, :, None] * self.likelihood
+        p_response = joint.sum(axis=1)
+        expected_entropy = xlogy(p_response, p_response).sum(axis=-1) - xlogy(
+            joint, joint
+        ).sum(axis=(1, 2))
+        return float(self._delta_values[expected_entropy.argmin()])
+
+    def threshold(self) -> float:
+        """Posterior mean threshold (on log scale)."""
+        return float(np.exp(self.posterior @ self._log_thresholds))
+
+    def estimate(self) -> float:
+        """delta_pmt at which the subject is correct with p_target."""
+        p_memory = (self.p_target - self.lapse_rate / 2) / (1 - self.lapse_rate)
+        return float(self.threshold() * ndtri(p_memory))
@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from expt.conditions import TrialSequence
+from expt.models import SubjectOptionModel, simulate_trial
+from expt.rewards import RewardSchedule
+from expt.rng import counter_generator, session_key
+
+# logged columns checked by the replay; floats are compared with a tolerance
+exact_columns = ["Condition", "option_a", "option_b", "bonus_trial", "correct"]
+float_columns = ["reward", "delta_pmt"]
+
+
+def read_session_log(file_path) -> pd.DataFrame:
+    """Trial rows of a session csv written by data.ExperimentHandler."""
+    df = pd.read_csv(file_path)
+    return df[df["response"].notna()].reset_index(drop=True)
+
+
+def replay_trials(df: pd.DataFrame):
+    """
+    Re-runs a logged session without a display: regenerates its trial
+    sequence, option assignment and reward schedule from the subject and
+    session keys, and applies the logged responses, adapting delta_pmt
+    on bonus trials of the adaptive testing session. delta_pmt starts at
+    the first logged value if it was logged, and at the default if not.
+    Reward stratification and the adaptive method are read from the log,
+    and default to unstratified and "staircase" for logs without them.
+    Session csvs from before rewards, sequences and options were drawn
+    from counter-based streams (i.e. with global numpy seeding) can't be
+    replayed; every trial of them shows up as a difference.
+    Returns the replayed trials and the number of trials in the session.
+    """
+    subject_id = int(df.loc[0, "Subject ID"])
+    day = int(df.loc[0, "Day"])
+    session_type = df.loc[0, "Session type"]
+    session_id = int(df.loc[0, "Session ID"])
+    adaptive = (session_type == "testing") & (session_id == 0)
+
+    # session settings logged with each trial, or their defaults
+    settings = {"stratify_rewards": False, "adaptive_method": "staircase"}
+    settings.update({key: df.loc[0, key] for key in settings if key in df})
+
+    rng_key = session_key(subject_id, day, session_type, session_id)
+    trial_conditions = TrialSequence(
+        session_type=session_type, session_id=session_id
+    ).generate(rng=counter_generator(rng_key, stream="sequence"))
+    reward_schedule = RewardSchedule(
+        trial_conditions, rng_key, stratify=bool(settings["stratify_rewards"])
+    )
+
+    model = SubjectOptionModel(
+        subject_id=subject_id, adaptive_method=settings["adaptive_method"]
+    )
+    if "delta_pmt" in df:
+        model.update_bonus_options(new_delta_pmt=float(df.loc[0, "delta_pmt"]))
+
+    replayed = []
+    for trial_index, response in enumerate(df["response"][: len(trial_conditions)]):
+        condition = trial_conditions[trial_index]
+        delta_pmt = model.delta_pmt
+        trial_data = simulate_trial(
+            model.all_options,
+            condition,
+            response=response,
+            reward_noise=reward_schedule.trial_noise(trial_index, response),
+        )
+        replayed.append(
+            {
+                "Condition": condition["Condition"],
+                "option_a": condition["option_a"],
+                "option_b": condition["option_b"],
+                "bonus_trial": trial_data["bonus_trial"],
+                "correct": trial_data["correct"],
+                "reward": trial_data["reward"],
+                "delta_pmt": delta_pmt,
+            }
+        )
+
+        if adaptive & trial_data["bonus_trial"]:
+            model.adapt_delta(correct=trial_data["correct"])
+
+    return pd.DataFrame(replayed), len(trial_conditions)
+
+
+def diff_session(
+    logged: pd.DataFrame, replayed: pd.DataFrame, n_trials: int, tolerance: float = 1e-6
+) -> pd.DataFrame:
+    """Logged and replayed values of every mismatching trial and column."""
+    diffs = []
+    if len(logged) != n_trials:
+        diffs.append(
+            {"trial": None, "column": "n_trials", "logged": len(logged), "replayed": n_trials}
+        )
+
+    n = len(replayed)
+    for column in exact_columns + float_columns:
+        if column not in logged:
+            continue
+
+        logged_values = logged[column].to_numpy()[:n]
+        replayed_values = replayed[column].to_numpy()
+        if column in float_columns:
+            matches = np.isclose(logged_values, replayed_values, rtol=0, atol=tolerance)
+        else:
+            matches = logged_values == replayed_values
+
+        for trial in np.flatnonzero(~matches):
+            diffs.append(
+                {
+                    "trial": int(trial),
+                    "column": column,
+                    "logged": logged_values[trial],
+                    "replayed": replayed_values[trial],
+                }
+            )
+
+    return pd.DataFrame(diffs, columns=["trial", "column", "logged", "replayed"])
+
+
+def replay_session(file_path, tolerance: float = 1e-6):
+    """Replays one session csv. Returns its summary and its differences."""
+    logged = read_session_log(file_path)
+    replayed, n_trials = replay_trials(logged)
+    diffs = diff_session(logged, replayed, n_trials, tolerance=tolerance)
+    diffs.insert(0, "file", str(file_path))
+
+    summary = {
+        "file": str(file_path),
+        "n_trials": len(logged),
+        "delta_pmt_logged": "delta_pmt" in logged,
+        "n_differences": len(diffs),
+    }
+    return summary, diffs
+
+
+def replay_sessions(file_paths, n_workers: int = None, **kwargs):
+    """
+    Replays many session csvs (e.g. sorted(Path("data").glob("*.csv")))
+    in parallel, one file per task, each with the settings it logged.
+    Returns a summary with one row per file and the report of all
+    differences found.
+    """
+    file_paths = [Path(file_path) for file_path in file_paths]
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(
+            executor.map(partial(replay_session, **kwargs), file_paths, chunksize=8)
+        )
+
+    summary = pd.DataFrame([summary for summary, _ in results])
+    diffs = pd.concat([diffs for _, diffs in results], ignore_index=True)
+    return summary, diffs
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+from scipy.special import ndtri
+from expt.rng import counter_generator
+
+
+@dataclass
+class RewardSchedule:
+    """
+    Standardized reward noise for both options of every trial in a
+    session, drawn at session setup with one batched call per option.
+    The reward of an option is meanReward + stdReward * noise, so the
+    schedule stays valid when bonus means change during the session.
+    With stratify, each option's draws are stratified over the normal
+    quantiles and re-centred if their mean is off by more than
+    tolerance (in SDs), so the realised mean matches meanReward.
+    Noise compiled ahead of time (see expt.plans) can be given instead.
+    """
+
+    trial_conditions: List[dict]
+    rng_key: np.ndarray
+    stratify: bool = False
+    tolerance: float = 0.05
+    noise: np.ndarray = None
+
+    def __post_init__(self):
+        if self.noise is not None:
+            return
+
+        option_ids = np.array(
+            [[trial["option_a"], trial["option_b"]] for trial in self.trial_conditions],
+            dtype=int,
+        ).reshape(-1, 2)
+
+        # noise[trial, side] with side 0 = left (option_a), 1 = right (option_b)
+        self.noise = np.zeros(option_ids.shape)
+        for option_id in np.unique(option_ids):
+            trials, sides = np.nonzero(option_ids == option_id)
+            rng = counter_generator(
+                self.rng_key, stream="reward_schedule", option=option_id
+            )
+            self.noise[trials, sides] = self._draw(rng, len(trials))
+
+    def _draw(self, rng, n: int) -> np.ndarray:
+        if not self.stratify:
+            return rng.standard_normal(n)
+
+        # one draw from each of n equiprobable strata, in random order
+        z = ndtri((rng.permutation(n) + rng.random(n)) / n)
+        if np.abs(z.mean()) > self.tolerance:
+            z -= z.mean()
+        return z
+
+    def trial_noise(self, trial_index: int, response: str) -> float:
+        """Noise of the reward for the given response on a trial."""
+        return self.noise[trial_index, ["left", "right"].index(response)]
@@ -0,0 +1,68 @@
+import numpy as np
+from expt.conditions import day_sessions
+
+
+def session_seed_sequence(
+    entropy: int, subject_id: int, day: int, session_index: int
+) -> np.random.SeedSequence:
+    """
+    Independent seed sequence for one session of one subject, keyed on
+    the subject id, the day, and the position of the session in the day.
+    The same key always gives the same stream, whichever process asks.
+    """
+    return np.random.SeedSequence(
+        entropy=entropy, spawn_key=(int(subject_id), int(day), int(session_index))
+    )
+
+
+def session_generator(
+    entropy: int, subject_id: int, day: int, session_index: int
+) -> np.random.Generator:
+    """Random generator for one session of one subject."""
+    return np.random.default_rng(
+        session_seed_sequence(entropy, subject_id, day, session_index)
+    )
+
+
+# study-wide entropy of the experiment's counter-based streams
+study_seed = 0
+
+# independent streams drawn for each key
+streams = {
+    "options": 0,
+    "sequence": 1,
+    "reward": 2,
+    "payoff": 3,
+    "reward_schedule": 4,
+}
+
+
+def philox_key(*key, entropy: int = study_seed) -> np.ndarray:
+    """
+    128-bit Philox key for e.g. (subject_id,) or (subject_id, day,
+    session_index), derived from the study entropy.
+    """
+    seed_sequence = np.random.SeedSequence(
+        entropy=entropy, spawn_key=tuple(int(k) for k in key)
+    )
+    return seed_sequence.generate_state(2, dtype=np.uint64)
+
+
+def counter_generator(
+    key: np.ndarray, stream: str, trial: int = 0, option: int = 0
+) -> np.random.Generator:
+    """
+    Counter-based generator for one (stream, trial, option) of a key.
+    Each combination maps to its own block of the Philox counter space,
+    so the randomness of any trial can be computed directly without
+    replaying the draws that come before it.
+    """
+    # draws advance the lowest counter word, so ids go in the upper words
+    counter = [0, int(trial), int(option), streams[stream]]
+    return np.random.Generator(np.random.Philox(key=key, counter=counter))
+
+
+def session_key(subject_id: int, day: int, session_type: str, session_id: int):
+    """Philox key of a session, keyed on its position in the day."""
+    session_index = day_sessions[day].index((session_type, session_id))
+    return philox_key(subject_id, day, session_index)
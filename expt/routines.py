@@ -1,11 +1,24 @@
-import random
-import numpy as np
 from dataclasses import dataclass
-from expt.conditions import TrialSequence
-from expt.info import load_subject_delta_pmt, save_subject_delta_pmt, set_file_path, set_random_seed
-from expt.instructions import BeginSessionScreen, EndOfExperimentDayScreen, EndSessionScreen, TotalEarningsScreen
-from expt.options import ChoiceOption, FixCross, FeedbackRect, FeedbackText, RespondFasterText, SubjectSpecificOptions
-from psychopy import visual, core, event, data
+from functools import partial
+import os
+from typing import Callable
+from expt.conditions import TrialSequence, day_sessions
+from expt.input import InputBackend, KeyboardInput
+from expt.info import load_subject_delta_pmt, save_subject_delta_pmt, set_file_path
+from expt.checkpoint import Checkpoint
+from expt.logger import TrialLogger, rebuild_csv
+from expt.instructions import BeginSessionScreen, EndOfExperimentDayScreen, EndSessionScreen, ScreenText, TotalEarningsScreen
+from expt.models import shuffle, trial_outcome
+from expt.options import ChoiceOption, SubjectSpecificOptions
+from expt.plans import DayPlan, SessionPlan, option_assignment, plan_path
+from expt.pool import StimulusPool
+from expt.rewards import RewardSchedule
+from expt.store import StudyStore
+from expt.subjects import SubjectStore
+from expt.warmup import WarmUp, print_warm_up_report
+from expt.timing import FrameScheduler
+from expt.rng import counter_generator, philox_key, session_key, study_seed
+from psychopy import visual, core, data
 
 
 @dataclass
@@ -15,15 +28,27 @@ class TrialRoutine:
     # condition: dict
     win: visual.Window
     all_choice_options: list
-    clock = core.Clock()
     fixation_time: float = 1
     feedback_time: float = 1
     inter_trial_interval: float = 1
+    rng_key: object = None  # philox key of the session's reward streams
+    reward_schedule: RewardSchedule = None
+    frame_scheduler: FrameScheduler = None
+    stimulus_pool: StimulusPool = None
+    input_backend: InputBackend = None
+    on_response: Callable = None  # called with the response data of each trial
 
     def __post_init__(self):
-        self.fix_cross = FixCross(self.win)
-        self.feedback_rect = FeedbackRect(self.win)
-        self.respond_faster_text = RespondFasterText(self.win)
+        self.trial_choices = []
+        if self.stimulus_pool is None:
+            self.stimulus_pool = StimulusPool(self.win)
+        if self.input_backend is None:
+            self.input_backend = KeyboardInput()
+        self.fix_cross = self.stimulus_pool.fix_cross
+        self.feedback_rect = self.stimulus_pool.feedback_rect
+        self.respond_faster_text = self.stimulus_pool.respond_faster_text
+        if self.frame_scheduler is None:
+            self.frame_scheduler = FrameScheduler(self.win)
 
     def _set_trial_type(self) -> None:
         """Records whether the current trial is a bonus trial"""
@@ -31,9 +56,10 @@ class TrialRoutine:
         if self.condition["Condition"] > 11:
             self.bonus_trial = True
 
-    def set_condition(self, condition: dict) -> None:
+    def set_condition(self, condition: dict, trial_index: int = 0) -> None:
         assert "option_a", "option_b" in condition
         self.condition = condition
+        self.trial_index = trial_index
         self._set_trial_type()
 
     def _assign_choice_options(self) -> None:
@@ -46,78 +72,86 @@ class TrialRoutine:
         self.option_b = self.all_choice_options[self.condition["option_b"]]
         self.trial_choices = [self.option_a, self.option_b]
 
+        # re-layout bonus texts whose reward changed since they were shown
+        for opt in self.trial_choices:
+            opt.refresh_text()
+
         # set position
         self.trial_choices[0].set_position(newPos="left")
         self.trial_choices[1].set_position(newPos="right")
 
-    def _outcome(self, response):
-        """Whether the response was correct or not and reward obtained."""
-        # mean rewards for both choice options
-        option_rewards = [opt.meanReward for opt in self.trial_choices]
-
-        # get index of the option with higher reward
-        idx_max_reward = option_rewards.index(max(option_rewards))
+    def _prefetch_feedback(self, options: list, trial_index: int) -> None:
+        """Prepares feedback texts for the rewards of both options."""
+        if self.reward_schedule is None:
+            return
 
-        # identify and return correct response
-        responses = ["left", "right"]
-        correct_response = responses[idx_max_reward]
-        outcome_correct = response == correct_response
+        rewards = [
+            opt.meanReward
+            + opt.stdReward * self.reward_schedule.trial_noise(trial_index, side)
+            for opt, side in zip(options, ["left", "right"])
+        ]
+        self.stimulus_pool.prefetch_feedback(rewards)
 
-        # outcome reward
-        outcome_reward = self.trial_choices[responses.index(response)].generate_reward()
-
-        return outcome_correct, outcome_reward
-
-    def run(self) -> dict:
+    def prepare(self, condition: dict, trial_index: int) -> None:
         """
-        Run the full trial routine.
-        Returns 2 tuples containing the data keys and values:
-        response, reaction time, correct, reward
+        Lays out the stimuli of an upcoming trial ahead of time. Options
+        still on screen are left as they are and updated when assigned.
         """
-        # Assign choice options for the trial
-        self._assign_choice_options()
+        options = [
+            self.all_choice_options[condition["option_a"]],
+            self.all_choice_options[condition["option_b"]],
+        ]
+        for opt, side in zip(options, ["left", "right"]):
+            if any(opt is shown for shown in self.trial_choices):
+                continue
+            opt.refresh_text()
+            self.stimulus_pool.prepare_option(opt, side)
+        self._prefetch_feedback(options, trial_index)
+
+    def _draw_choices(self) -> None:
+        for opt, side in zip(self.trial_choices, ["left", "right"]):
+            self.stimulus_pool.draw_option(opt, side)
+
+    def _draw_feedback(self) -> None:
+        self._draw_choices()
+        self.feedback_rect.shape.draw()
+        self.feedback_text.shape.draw()
+        if self.rt > 3:
+            self.respond_faster_text.shape.draw()
 
-        # Show fixation cross and wait 1 second
-        self.fix_cross.shape.draw()
-        self.win.flip()
-        core.wait(self.fixation_time)
+    def _reward_rng(self, response):
+        """Counter-based stream for the reward of the chosen option."""
+        if self.rng_key is None:
+            return None
 
-        # Show choice options
-        for opt in self.trial_choices:
-            opt.shape.draw()
-        self.win.flip()
-
-        # Reset clock to zero
-        self.clock.reset()
-
-        # record response, response time, and correct
-        keys = event.waitKeys(keyList=["left", "right", "escape"])
-        rt = self.clock.getTime()
-        resp = keys[0]
-        if resp != "escape":
-            corr, rew = self._outcome(response=resp)
-        else:
+        option_id = self.condition["option_a" if response == "left" else "option_b"]
+        return counter_generator(
+            self.rng_key, stream="reward", trial=self.trial_index, option=option_id
+        )
+
+    def _outcome(self, response):
+        """Whether the response was correct or not and reward obtained."""
+        # rewards are pre-drawn at session setup when a schedule is set
+        if self.reward_schedule is not None:
+            return trial_outcome(
+                self.trial_choices,
+                response=response,
+                reward_noise=self.reward_schedule.trial_noise(self.trial_index, response),
+            )
+
+        return trial_outcome(
+            self.trial_choices, response=response, rng=self._reward_rng(response)
+        )
+
+    def _respond(self, resp: str, rt: float, next_trial: tuple) -> None:
+        """Scores the response and queues the work it leaves for spare frames."""
+        if resp == "escape":
             print("\nUser terminated the experiment!\n")
             core.quit()
 
-        # show feedback with choice options
-        for opt in self.trial_choices:
-            opt.shape.draw()
-        self.feedback_rect.set_position(newPos=resp)
-        self.feedback_rect.shape.draw()
-        feedback_text = FeedbackText(self.win, rew, pos=resp)
-        feedback_text.shape.draw()
-        if rt > 3:
-            self.respond_faster_text.shape.draw()
-        self.win.flip()
-        core.wait(self.feedback_time)
-
-        # Inter-trial interval
-        self.win.flip()
-        core.wait(self.inter_trial_interval)
-
-        # defining quantities to return
-        trial_data = {
+        self.rt = rt
+        corr, rew = self._outcome(response=resp)
+        self.response_data = {
             "response": resp,
             "reaction_time": rt,
             "correct": corr,
@@ -125,6 +159,79 @@ class TrialRoutine:
             "bonus_trial": self.bonus_trial,
         }
 
+        # feedback with choice options
+        self.feedback_rect.set_position(newPos=resp)
+        self.feedback_text = self.stimulus_pool.feedback_text(rew, pos=resp)
+
+        if self.on_response is not None:
+            self.frame_scheduler.schedule(partial(self.on_response, self.response_data))
+        if next_trial is not None:
+            self.frame_scheduler.schedule(partial(self.prepare, *next_trial))
+
+    def run(self, next_trial: tuple = None) -> dict:
+        """
+        Run the full trial routine as a per-frame state machine:
+        fixation -> choice -> feedback -> ITI, with one flip per frame.
+        Frame time left after each flip runs queued background tasks,
+        such as on_response and preparing next_trial (condition, index).
+        The current phase is kept in self.state.
+        Returns the trial data: response, reaction time, correct, reward.
+        """
+        # Assign choice options for the trial
+        self._assign_choice_options()
+        for opt, side in zip(self.trial_choices, ["left", "right"]):
+            self.stimulus_pool.prepare_option(opt, side)
+        self._prefetch_feedback(self.trial_choices, self.trial_index)
+        self.frame_scheduler.start_trial()
+
+        # draw function, duration and next state of each timed phase
+        phases = {
+            "fixation": (self.fix_cross.shape.draw, self.fixation_time, "choice"),
+            "feedback": (self._draw_feedback, self.feedback_time, "iti"),
+            "iti": (lambda: None, self.inter_trial_interval, "done"),
+        }
+
+        self.state, frame, onsets = "fixation", 0, {}
+        while self.state != "done":
+            if self.state == "choice":
+                # response times start at the choice onset flip
+                if frame == 0:
+                    self.input_backend.start(self.win)
+                self._draw_choices()
+            else:
+                phases[self.state][0]()
+
+            flip_time = self.frame_scheduler.flip()
+            if frame == 0:
+                onsets[self.state] = flip_time
+            frame += 1
+
+            # move on once a phase has lasted its frames or a key is pressed
+            next_state = self.state
+            if self.state == "choice":
+                keys = self.input_backend.poll()
+                if keys:
+                    self._respond(*keys[0], next_trial=next_trial)
+                    next_state = "feedback"
+            elif frame == self.frame_scheduler.n_frames(phases[self.state][1]):
+                next_state = phases[self.state][2]
+
+            if next_state != self.state:
+                self.state, frame = next_state, 0
+
+            self.frame_scheduler.run_tasks()
+
+        # work that did not fit in spare frame time
+        self.frame_scheduler.run_tasks(force=True)
+
+        # defining quantities to return
+        trial_data = {
+            **self.response_data,
+            "choice_onset": onsets["choice"],
+            "feedback_latency": onsets["feedback"] - (onsets["choice"] + self.rt),
+            **self.frame_scheduler.trial_log(),
+        }
+
         return trial_data
 
     def simulate_wo_user_input(self) -> dict:
@@ -161,69 +268,211 @@ class SessionRoutine:
     session_id: int
     final_session = False
     session_type: str = None
+    stratify_rewards: bool = False
+    frame_scheduler: FrameScheduler = None
+    stimulus_pool: StimulusPool = None
+    input_backend: InputBackend = None
+    session_plan: SessionPlan = None
+    checkpoint: Checkpoint = None
+    study_store: StudyStore = None
+    subject_store: SubjectStore = None
+    data_dir: str = "./data"
+    initial_screen: ScreenText = None
+    final_screen: ScreenText = None
 
     def __post_init__(self):
         self.session_payoff = []
 
-        # screens to display at the beginning and end of sesions
-        self.initial_screen = BeginSessionScreen(self.win)
-        if not self.final_session:
-            self.final_screen = EndSessionScreen(self.win)
-        else:
-            self.final_screen = EndOfExperimentDayScreen(self.win)
-
-    def setup_session_info(self):
-        # experiment info
+        # screens to display at the beginning and end of sesions,
+        # unless shared ones (e.g. warmed up) are given
+        kwargs = {"win": self.win, "input_backend": self.input_backend}
+        if self.initial_screen is None:
+            self.initial_screen = BeginSessionScreen(**kwargs)
+        if self.final_screen is None:
+            if not self.final_session:
+                self.final_screen = EndSessionScreen(**kwargs)
+            else:
+                self.final_screen = EndOfExperimentDayScreen(**kwargs)
+
+    def setup_session_info(self, date_time: str = None):
+        # experiment info; a resumed session keeps its date and files
         self.session_info["Session type"] = self.session_type
         self.session_info["Session ID"] = self.session_id
-        self.session_info["DateTime"] = data.getDateStr()
-
-        # set random seeds
-        set_random_seed(self.session_info)
+        self.session_info["DateTime"] = data.getDateStr() if date_time is None else date_time
+
+        # key of the session's counter-based random streams
+        self.rng_key = session_key(
+            self.session_info["Subject ID"],
+            self.session_info["Day"],
+            self.session_type,
+            self.session_id,
+        )
         
         # set path to save file
-        file_path = set_file_path(self.session_info)
+        file_path = set_file_path(self.session_info, self.data_dir)
 
-        # data handler for session
-        self.data_handler = data.ExperimentHandler(extraInfo=self.session_info, dataFileName=file_path)
+        # data handler for session; the csv is rebuilt from the crash-safe
+        # trial log instead of being written by the handler at the end
+        self.data_handler = data.ExperimentHandler(
+            extraInfo=self.session_info, dataFileName=file_path, saveWideText=False
+        )
+        self.log_path, self.csv_path = f"{file_path}.jsonl", f"{file_path}.csv"
+        self.trial_logger = TrialLogger(self.log_path)
 
     def initialize_trials(self):
         """Initialize trial conditions and routine."""
-        self.trial_conditions = TrialSequence(session_type=self.session_type, session_id=self.session_id).generate()
-        self.trial_routine = TrialRoutine(win=self.win, all_choice_options=self.choice_options.all_options)
+        if self.session_plan is None:
+            self.trial_conditions = TrialSequence(session_type=self.session_type, session_id=self.session_id).generate(
+                rng=counter_generator(self.rng_key, stream="sequence")
+            )
+            self.reward_schedule = RewardSchedule(
+                self.trial_conditions, self.rng_key, stratify=self.stratify_rewards
+            )
+        else:
+            # stream through the plan compiled ahead of time
+            self.trial_conditions = self.session_plan.trial_conditions
+            self.reward_schedule = RewardSchedule(
+                self.trial_conditions, self.rng_key, noise=self.session_plan.reward_noise
+            )
+        self.trial_routine = TrialRoutine(
+            win=self.win,
+            all_choice_options=self.choice_options.all_options,
+            reward_schedule=self.reward_schedule,
+            frame_scheduler=self.frame_scheduler,
+            stimulus_pool=self.stimulus_pool,
+            input_backend=self.input_backend,
+            rng_key=self.rng_key,
+        )
+
+        # rasterize the subject's options once per session in cached mode
+        if self.trial_routine.stimulus_pool.atlas is not None:
+            self.trial_routine.stimulus_pool.atlas.prerender(self.choice_options.all_options)
 
     def setup_data_handlers(self):
         """Setup handlers for data collection."""
         self.trials = data.TrialHandler(trialList=self.trial_conditions, nReps=1, method="sequential")
         self.data_handler.addLoop(self.trials)
-        self.payoff_trial_index = np.random.choice(self.trials.nTotal, size=2, replace=False)
+        if self.session_plan is None:
+            self.payoff_trial_index = counter_generator(self.rng_key, stream="payoff").choice(
+                self.trials.nTotal, size=2, replace=False
+            )
+        else:
+            self.payoff_trial_index = self.session_plan.payoff_trial_index
+
+    def _next_trial(self):
+        """Condition and index of the trial after the current one."""
+        next_index = self.trials.thisIndex + 1
+        if next_index < self.trials.nTotal:
+            return self.trial_conditions[next_index], next_index
+        return None
+
+    def record_trial(self, this_trial, trial_data: dict, delta_pmt: float) -> None:
+        """Adds a trial's data to the data handler and the trial log."""
+        for data_key, data_value in trial_data.items():
+            self.trials.addData(data_key, data_value)
+        self.trials.addData("delta_pmt", delta_pmt)
+
+        # settings needed to replay the session
+        settings = {
+            "stratify_rewards": self.stratify_rewards,
+            "adaptive_method": self.choice_options.model.adaptive_method,
+        }
+        self.trial_logger.log(
+            {
+                "trial_index": self.trials.thisIndex,
+                **this_trial,
+                **trial_data,
+                "delta_pmt": delta_pmt,
+                **settings,
+                **self.session_info,
+            }
+        )
+
+    def save_checkpoint(self) -> None:
+        """
+        Saves the session's progress every checkpoint.every trials, once
+        the trial log is synced up to the current trial.
+        """
+        n_trials_done = self.trials.thisIndex + 1
+        if (self.checkpoint is None) or (n_trials_done % self.checkpoint.every != 0):
+            return
+
+        self.checkpoint.state = {
+            **self.checkpoint.state,
+            "session": {
+                "DateTime": self.session_info["DateTime"],
+                "next_trial": n_trials_done,
+                "session_payoff": list(self.session_payoff),
+            },
+            "adaptive_state": self.choice_options.model.adaptive_state(),
+        }
+        self.trial_logger.after_sync(partial(self.checkpoint.save, self.checkpoint.state))
 
     def run_trial_sequence(self):
         """Run sequence of trials for the session."""
         for this_trial in self.trials:
-            # run one trial
-            self.trial_routine.set_condition(condition=this_trial)
-            trial_data = self.trial_routine.run()
+            # skip the trials run before the session was resumed
+            if self.trials.thisIndex < self.first_trial:
+                continue
+
+            # run one trial, preparing the next one in spare frame time
+            self.trial_routine.set_condition(condition=this_trial, trial_index=self.trials.thisIndex)
+            delta_pmt = self.choice_options.delta_pmt
+            trial_data = self.trial_routine.run(next_trial=self._next_trial())
 
-            # record data
-            for data_key, data_value in trial_data.items():
-                self.trials.addData(data_key, data_value)
+            # record data, with the delta_pmt the trial was shown at
+            self.record_trial(this_trial, trial_data, delta_pmt)
 
             # record payoff for randomly set payoff trial
             if self.trials.thisIndex in self.payoff_trial_index:
                 self.session_payoff += [trial_data["reward"]]
+            self.save_checkpoint()
 
             # indicate end of trial to data handler
             self.data_handler.nextEntry()
 
 
-    def run(self):
-        self.setup_session_info()
+    def save_session_data(self) -> None:
+        """Writes the session csv and stores once all trials are logged."""
+        self.trial_logger.close()
+        df = rebuild_csv(self.log_path, self.csv_path)
+        if self.study_store is not None:
+            self.study_store.append_session(df)
+        if self.subject_store is not None:
+            self.subject_store.complete_session(
+                self.session_info["Subject ID"],
+                self.session_info["Day"],
+                self.session_type,
+                self.session_id,
+                date_time=self.session_info["DateTime"],
+            )
+
+    def run(self, resume_state: dict = None, on_complete: Callable = None):
+        """
+        Runs the session, continuing after the last checkpointed trial
+        when resuming. on_complete is called with the session payoff once
+        its data is saved, before the final screen is shown.
+        """
+        self.first_trial = 0
+        if resume_state is not None:
+            self.first_trial = resume_state["next_trial"]
+            self.session_payoff = list(resume_state["session_payoff"])
+
+        self.setup_session_info(None if resume_state is None else resume_state["DateTime"])
         self.initialize_trials()
         self.setup_data_handlers()
-        self.initial_screen.show()
-        self.run_trial_sequence()
-        self.final_screen.show()
+
+        # a session whose trials all ran before a crash only saves its data
+        trials_done = self.first_trial >= self.trials.nTotal
+        if not trials_done:
+            self.initial_screen.show()
+            self.trial_routine.frame_scheduler.pause()
+            self.run_trial_sequence()
+        self.save_session_data()
+        if on_complete is not None:
+            on_complete(self.session_payoff)
+        if not trials_done:
+            self.final_screen.show()
         return self.session_payoff
 
 
@@ -247,32 +496,29 @@ class AdaptiveTestingSession(SessionRoutine):
     session_type = "testing"
     session_id = 0
 
+    def _adapt_delta(self, response_data: dict) -> None:
+        """Adapts delta on each bonus trial."""
+        if response_data["bonus_trial"]:
+            self.choice_options.adapt_delta(correct=response_data["correct"])
+
     def run_trial_sequence(self):
         """Run sequence of trials for the session."""
-        for this_trial in self.trials:
-            # run one trial
-            self.trial_routine.set_condition(condition=this_trial)
-            trial_data = self.trial_routine.run()
-
-            # record data
-            for data_key, data_value in trial_data.items():
-                self.trials.addData(data_key, data_value)
+        # adapt delta during the feedback of each trial, before the
+        # next trial's bonus texts are prepared
+        self.trial_routine.on_response = self._adapt_delta
+        super().run_trial_sequence()
 
-            # adapt delta on each bonus trial
-            if trial_data["bonus_trial"]:
-                delta_pmt = self.choice_options.adapt_delta(
-                    correct=trial_data["correct"]
-                )
-
-            # record payoff for randomly set payoff trial
-            if self.trials.thisIndex in self.payoff_trial_index:
-                self.session_payoff += [trial_data["reward"]]
-
-            # indicate end of trial to data handler
-            self.data_handler.nextEntry()
-        
+    def save_session_data(self) -> None:
         # save final delta_pmt for subject at the end of the session
-        save_subject_delta_pmt(delta_pmt, self.session_info["Subject ID"])
+        save_subject_delta_pmt(
+            self.choice_options.delta_pmt,
+            self.session_info["Subject ID"],
+            subject_store=self.subject_store,
+            day=self.session_info["Day"],
+            session_type=self.session_type,
+            session_id=self.session_id,
+        )
+        super().save_session_data()
 
 
 @dataclass
@@ -280,62 +526,200 @@ class DayRoutine:
     win: visual.Window
     choice_options: SubjectSpecificOptions
     experiment_info: dict
+    render_mode: str = "vector"
+    input_backend: InputBackend = None
+    frame_scheduler: FrameScheduler = None
+    plan_dir: str = None
+    resume: bool = False
+    checkpoint_every: int = 1
+    stratify_rewards: bool = False
+    study_store: StudyStore = None
+    subject_store: SubjectStore = None
+    data_dir: str = "./data"  # session files, checkpoints and default stores
 
     def __post_init__(self):
+        if self.study_store is None:
+            self.study_store = StudyStore(os.path.join(self.data_dir, "study.h5"))
+        if self.subject_store is None:
+            self.subject_store = SubjectStore(os.path.join(self.data_dir, "subjects.db"))
         self.day = self.experiment_info["Day"]
         assert self.day in [1,2], "Input Day must be 1 or 2"
+
+        # persist the subject's options, and check them on later days
+        self.subject_store.register_subject(
+            self.experiment_info["Subject ID"],
+            option_assignment(self.choice_options.model),
+            study_seed,
+        )
+        self.load_day_plan()
+        self.setup_checkpoint()
+        if self.input_backend is None:
+            self.input_backend = KeyboardInput()
+        if self.frame_scheduler is None:
+            self.frame_scheduler = FrameScheduler(self.win)
+        self.stimulus_pool = StimulusPool(self.win, render_mode=self.render_mode)
+        self.setup_screens()
         self.setup_session_routines()
 
+    def load_day_plan(self):
+        """Loads the subject's compiled plan for the day, if a plan_dir is set."""
+        self.day_plan = None
+        if self.plan_dir is None:
+            return
+
+        self.day_plan = DayPlan.load(
+            plan_path(self.plan_dir, self.experiment_info["Subject ID"], self.day)
+        )
+        if self.day_plan.assignment != option_assignment(self.choice_options.model):
+            raise ValueError("Plan was compiled for a different option assignment!")
+        plan_sessions = [(s.session_type, s.session_id) for s in self.day_plan.sessions]
+        if plan_sessions != day_sessions[self.day]:
+            raise ValueError("Plan was compiled for different sessions!")
+        if self.day_plan.stratify_rewards != self.stratify_rewards:
+            raise ValueError("Plan was compiled with different reward stratification!")
+
+    def setup_checkpoint(self):
+        """Loads the day's checkpoint when resuming, or starts a new one."""
+        subject_id = self.experiment_info["Subject ID"]
+        kwargs = {"checkpoint_dir": self.data_dir, "every": self.checkpoint_every}
+        if not self.resume:
+            self.checkpoint = Checkpoint(subject_id, self.day, **kwargs)
+            return
+
+        self.checkpoint = Checkpoint.load(subject_id, self.day, **kwargs)
+        if self.checkpoint is None:
+            print("\nThere is no checkpoint to resume for this subject and day!\n")
+            core.quit()
+
+    def setup_screens(self):
+        """Screens shared by all sessions of the day, so they are warmed up once."""
+        kwargs = {"win": self.win, "input_backend": self.input_backend}
+        self.begin_session_screen = BeginSessionScreen(**kwargs)
+        self.end_session_screen = EndSessionScreen(**kwargs)
+        self.total_earnings_screen = TotalEarningsScreen(**kwargs)
+
     def setup_session_routines(self):
         kwargs = {
             "win": self.win,
             "choice_options": self.choice_options,
-            "session_info": self.experiment_info
+            "session_info": self.experiment_info,
+            "frame_scheduler": self.frame_scheduler,
+            "stimulus_pool": self.stimulus_pool,
+            "input_backend": self.input_backend,
+            "checkpoint": self.checkpoint,
+            "stratify_rewards": self.stratify_rewards,
+            "study_store": self.study_store,
+            "subject_store": self.subject_store,
+            "data_dir": self.data_dir,
+            "initial_screen": self.begin_session_screen,
+            "final_screen": self.end_session_screen,
         }
 
-        if self.day == 1:
-            self.session_routines = [
-                TrainingSession(session_id=1, session_type="training", **kwargs),
-                TrainingSession(session_id=2, session_type="training", **kwargs),
-                AdaptiveTestingSession(session_id=0, session_type="testing", **kwargs),
-                TestingSession(session_id=1, session_type="testing", **kwargs),
-                TestingSession(session_id=2, session_type="testing", **kwargs),
-                TestingSession(session_id=3, session_type="testing", **kwargs),
-            ]
-
-        elif self.day == 2:
-            self.session_routines = [
-                PracticeSession(session_id=1, session_type="practice", **kwargs),
-                TestingSession(session_id=4, session_type="testing", **kwargs),
-                TestingSession(session_id=5, session_type="testing", **kwargs),
-                TestingSession(session_id=6, session_type="testing", **kwargs),
-                TestingSession(session_id=7, session_type="testing", **kwargs),
-                TestingSession(session_id=8, session_type="testing", **kwargs),
-                TestingSession(session_id=9, session_type="testing", **kwargs),
-                TestingSession(session_id=10, session_type="testing", **kwargs),
-            ]
-            
+        session_routines = {
+            "practice": PracticeSession,
+            "training": TrainingSession,
+            "testing": TestingSession,
+        }
+
+        self.session_routines = []
+        for idx, (session_type, session_id) in enumerate(day_sessions[self.day]):
+            session_routine = session_routines[session_type]
+            if (session_type == "testing") & (session_id == 0):
+                session_routine = AdaptiveTestingSession
+            if self.day_plan is not None:
+                kwargs["session_plan"] = self.day_plan.sessions[idx]
+            self.session_routines.append(
+                session_routine(session_id=session_id, session_type=session_type, **kwargs)
+            )
+
+        if self.day == 2:
             # load delta_pmt from previous day's adaptive testing session
-            delta_pmt = load_subject_delta_pmt(self.experiment_info["Subject ID"])
+            delta_pmt = load_subject_delta_pmt(
+                self.experiment_info["Subject ID"],
+                subject_store=self.subject_store,
+                data_dir=self.data_dir,
+            )
             self.choice_options.update_bonus_options(new_delta_pmt=delta_pmt)
 
+    def warm_up_stimuli(self) -> list:
+        """Draws all stimuli of the day once before the first session."""
+        # lay out bonus texts whose reward changed, so they are warmed as shown
+        options = self.choice_options.all_options
+        for option in options:
+            option.refresh_text()
+        stims = self.stimulus_pool.option_stims(options)
+        stims += [
+            ("fix_cross", self.stimulus_pool.fix_cross.shape),
+            ("feedback_rect", self.stimulus_pool.feedback_rect.shape),
+            ("respond_faster_text", self.stimulus_pool.respond_faster_text.shape),
+            ("feedback_text", self.stimulus_pool.feedback_text(10, "left").shape),
+        ]
+        stims += [
+            (type(screen).__name__, screen.text_stim())
+            for screen in [self.begin_session_screen, self.end_session_screen]
+        ]
+
+        # earnings with every payoff row; only the amounts change when shown
+        earnings_screen = self.total_earnings_screen
+        earnings_screen.payoff_list = [0] * earnings_screen.max_payoffs
+        stims += [
+            (f"TotalEarningsScreen_{i}", stim)
+            for i, stim in enumerate(earnings_screen.text_stims())
+        ]
+
+        report = WarmUp(self.win).run(stims)
+        print_warm_up_report(report)
+        return report
+
+    def complete_session(self, idx: int, session_type: str, session_payoff: list) -> None:
+        """
+        Moves the checkpoint past the idx-th session of the day as soon as
+        its data is saved, so it is not run again on resume.
+        """
+        payoff_list = list(self.checkpoint.state["payoff_list"])
+        if session_type == "testing":
+            payoff_list += session_payoff
+
+        self.checkpoint.state = {
+            **self.checkpoint.state,
+            "session_index": idx + 1,
+            "payoff_list": payoff_list,
+            "session": None,
+            "adaptive_state": self.choice_options.model.adaptive_state(),
+        }
+        self.checkpoint.save()
+
     def run(self):
         """Run the full experiment day."""
-        
-        # run each session and collect randomly selected payoff
-        payoff_list = []
-        for session_routine in self.session_routines:
-            session_payoff = session_routine.run()
-            if session_routine.session_type == "testing":
-                payoff_list += session_payoff
+        # restore the adaptive state when resuming, before the bonus
+        # texts it sets are warmed up
+        state = self.checkpoint.state
+        if state["adaptive_state"] is not None:
+            self.choice_options.restore_adaptive_state(state["adaptive_state"])
+        self.warm_up_stimuli()
+
+        # run each session and collect randomly selected payoff,
+        # continuing from the checkpointed session when resuming
+        for idx, session_routine in enumerate(self.session_routines):
+            if idx < state["session_index"]:
+                continue
+
+            resume_state = state["session"] if idx == state["session_index"] else None
+            session_routine.run(
+                resume_state=resume_state,
+                on_complete=partial(self.complete_session, idx, session_routine.session_type),
+            )
+        payoff_list = list(self.checkpoint.state["payoff_list"])
 
         # pick five trials at random 
-        random.shuffle(payoff_list)
-        payoff_list = payoff_list[:5]
+        day_key = philox_key(self.experiment_info["Subject ID"], self.day)
+        shuffle(payoff_list, counter_generator(day_key, stream="payoff"))
+        payoff_list = payoff_list[:self.total_earnings_screen.max_payoffs]
         
         # display total earnings at the end of the day
-        total_earnings_screen = TotalEarningsScreen(win=self.win, payoff_list=payoff_list)
-        total_earnings_screen.show()
+        self.total_earnings_screen.payoff_list = payoff_list
+        self.total_earnings_screen.show()
+        self.checkpoint.remove()
 
         # print on terminal
         print("\nEnd of experiment day!\n")
\ No newline at end of file
@@ -0,0 +1,287 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import os
+import numpy as np
+import pandas as pd
+from scipy.special import expit, ndtr
+from expt.conditions import TrialSequence, day_sessions, trial_dtype
+from expt.models import SubjectOptionModel, delta_step
+from expt.rng import session_generator
+
+
+# codes of responses and session types in simulated data
+responses = np.array(["left", "right"])
+session_types = np.array(["practice", "training", "testing"])
+
+
+def option_attributes(meanReward: float = 10):
+    """
+    Mean reward, stakes and relative frequency of the 12 shape options,
+    indexed by option id. These do not depend on the subject, since the
+    set/color shuffle only changes which stimulus is shown for an option.
+    """
+    stakes = np.repeat(SubjectOptionModel.stakes, 3)
+    freqs = np.repeat(SubjectOptionModel.freqs, 3)
+    shape_means = meanReward + stakes * np.tile([1, 0, -1], 4)
+    return shape_means, stakes, freqs
+
+
+def option_means(option_ids: np.ndarray, delta_pmt: np.ndarray) -> np.ndarray:
+    """
+    Mean reward of options (n_subjects, n_trials) given each
+    subject's current delta_pmt (n_subjects,).
+    """
+    shape_means, _, _ = option_attributes()
+    sign = (option_ids >= 12).astype(int) - 2 * (option_ids >= 24)
+    return shape_means[option_ids % 12] + sign * np.asarray(delta_pmt)[:, None]
+
+
+@dataclass
+class RandomPolicy:
+    """Chooses either option with equal probability."""
+
+    def p_option_a(self, mean_a, mean_b, option_a, option_b) -> np.ndarray:
+        return np.full(np.shape(mean_a), 0.5)
+
+
+@dataclass
+class SoftmaxPolicy:
+    """Softmax choice on the true mean rewards of the two options."""
+
+    beta: float = 1
+
+    def p_option_a(self, mean_a, mean_b, option_a, option_b) -> np.ndarray:
+        return expit(self.beta * (mean_a - mean_b))
+
+
+@dataclass
+class NoisyMemoryPolicy:
+    """
+    Compares noisy memories of the shape options' mean rewards. Memory
+    precision grows with the option's stakes and frequency; bonus options
+    are shown as numbers and recalled without noise.
+    """
+
+    sigma_base: float = 3
+    stakes_gain: float = 0.5
+    freq_gain: float = 0.5
+    lapse: float = 0.02
+
+    def memory_sd(self, option_ids: np.ndarray) -> np.ndarray:
+        _, stakes, freqs = option_attributes()
+        precision = (
+            1
+            + self.stakes_gain * (stakes == max(stakes))
+            + self.freq_gain * (freqs == max(freqs))
+        )
+        sd = self.sigma_base / precision
+        return np.where(option_ids < 12, sd[option_ids % 12], 0)
+
+    def p_option_a(self, mean_a, mean_b, option_a, option_b) -> np.ndarray:
+        sd = np.sqrt(self.memory_sd(option_a) ** 2 + self.memory_sd(option_b) ** 2)
+        p_a = ndtr((mean_a - mean_b) / sd)
+        return self.lapse / 2 + (1 - self.lapse) * p_a
+
+
+def simulate_choices(
+    option_a, option_b, delta_pmt, policy, u: np.ndarray, z: np.ndarray
+) -> dict:
+    """
+    Outcome of trials (n_subjects, n_trials) for given uniform (u)
+    and standard normal (z) draws; option_a is shown on the left.
+    """
+    mean_a = option_means(option_a, delta_pmt)
+    mean_b = option_means(option_b, delta_pmt)
+
+    chose_a = u < policy.p_option_a(mean_a, mean_b, option_a, option_b)
+    chosen = np.where(chose_a, option_a, option_b)
+    chosen_mean = np.where(chose_a, mean_a, mean_b)
+
+    # ties are correct on the left, as in the trial routine
+    correct = np.where(chose_a, mean_a >= mean_b, mean_b > mean_a)
+    reward = chosen_mean + (chosen < 12) * z
+
+    return {"response": (~chose_a).astype(np.int8), "correct": correct, "reward": reward}
+
+
+@dataclass
+class CohortSimulator:
+    """
+    Vectorized simulation of a cohort of synthetic subjects running
+    all sessions of the given experiment days, one session at a time
+    with all subjects and trials as NumPy arrays.
+    """
+
+    n_subjects: int
+    policy: object = field(default_factory=RandomPolicy)
+    days: tuple = (1, 2)
+    delta_pmt: float = 4
+    reaction_time: float = 0.1
+    first_subject_id: int = 0
+
+    def _draw_session(self, trial_sequence, subject_ids, day, session_index):
+        """
+        Draws the trial sequence and the choice (u) and reward (z) noise of
+        one session, each subject from its own session stream.
+        """
+        sequences = np.empty((len(subject_ids), trial_sequence.n_trials), dtype=trial_dtype)
+        u = np.empty(sequences.shape)
+        z = np.empty(sequences.shape)
+        for i, subject_id in enumerate(subject_ids):
+            rng = session_generator(self.entropy, subject_id, day, session_index)
+            sequences[i] = trial_sequence.generate_array(rng=rng)
+            u[i] = rng.random(trial_sequence.n_trials)
+            z[i] = rng.standard_normal(trial_sequence.n_trials)
+
+        return sequences, u, z
+
+    def _simulate_session(self, sequences, delta_pmt, adaptive, u, z) -> dict:
+        """
+        Simulates one session for all subjects; updates delta_pmt in place.
+        The outcome includes the delta_pmt each trial was shown at.
+        """
+        # delta_pmt only changes within the adaptive testing session
+        if not adaptive:
+            outcome = simulate_choices(
+                sequences["option_a"], sequences["option_b"], delta_pmt, self.policy, u, z
+            )
+            outcome["delta_pmt"] = np.repeat(delta_pmt[:, None], sequences.shape[1], axis=1)
+            return outcome
+
+        outcome = {
+            "response": np.empty(sequences.shape, dtype=np.int8),
+            "correct": np.empty(sequences.shape, dtype=bool),
+            "reward": np.empty(sequences.shape),
+            "delta_pmt": np.empty(sequences.shape),
+        }
+        counter = np.zeros(len(sequences), dtype=int)
+        for t in range(sequences.shape[1]):
+            trial = sequences[:, t : t + 1]
+            outcome["delta_pmt"][:, t] = delta_pmt
+            trial_outcome = simulate_choices(
+                trial["option_a"],
+                trial["option_b"],
+                delta_pmt,
+                self.policy,
+                u[:, t : t + 1],
+                z[:, t : t + 1],
+            )
+            for key, value in trial_outcome.items():
+                outcome[key][:, t] = value[:, 0]
+
+            # adapt delta on each bonus trial
+            bonus_trial = trial["bonus_trial"][:, 0]
+            counter += bonus_trial
+            change_in_delta = delta_step(counter, outcome["correct"][:, t])
+            delta_pmt += np.where(bonus_trial, change_in_delta, 0)
+
+        return outcome
+
+    def run(self, seed=None) -> dict:
+        """
+        Runs all sessions and returns flat arrays of trial data with the
+        columns recorded by SessionRoutine.run_trial_sequence, plus subject
+        and session identifiers. Responses and session types are stored as
+        codes into `responses` and `session_types`.
+        Each subject's sessions draw from their own streams keyed on
+        (seed, subject, day, session), so a subject's data does not depend
+        on which other subjects are simulated alongside it.
+        """
+        self.entropy = np.random.SeedSequence(seed).entropy
+        subject_ids = self.first_subject_id + np.arange(self.n_subjects)
+        delta_pmt = np.full(self.n_subjects, self.delta_pmt, dtype=float)
+
+        blocks = []
+        for day in self.days:
+            for session_index, (session_type, session_id) in enumerate(
+                day_sessions[day]
+            ):
+                sequences, u, z = self._draw_session(
+                    TrialSequence(session_type, session_id), subject_ids, day, session_index
+                )
+                adaptive = (session_type == "testing") & (session_id == 0)
+                outcome = self._simulate_session(sequences, delta_pmt, adaptive, u, z)
+
+                shape = sequences.shape
+                block = {
+                    "Subject ID": np.repeat(subject_ids[:, None], shape[1], axis=1),
+                    "Day": np.full(shape, day, dtype=np.int8),
+                    "Session type": np.full(
+                        shape,
+                        np.flatnonzero(session_types == session_type)[0],
+                        dtype=np.int8,
+                    ),
+                    "Session ID": np.full(shape, session_id, dtype=np.int8),
+                    "Trial": np.tile(np.arange(shape[1], dtype=np.int16), (shape[0], 1)),
+                    "Condition": sequences["Condition"],
+                    "option_a": sequences["option_a"],
+                    "option_b": sequences["option_b"],
+                    "response": outcome["response"],
+                    "reaction_time": np.full(shape, self.reaction_time),
+                    "correct": outcome["correct"],
+                    "reward": outcome["reward"],
+                    "bonus_trial": sequences["bonus_trial"],
+                    "delta_pmt": outcome["delta_pmt"],
+                }
+                blocks.append(block)
+
+        # rows ordered by subject, then day, session and trial
+        self.final_delta_pmt = delta_pmt
+        return {
+            key: np.concatenate([block[key] for block in blocks], axis=1).ravel()
+            for key in blocks[0]
+        }
+
+
+def _simulate_chunk(simulator_kwargs: dict, seed: int):
+    """Runs one chunk of subjects in a worker process."""
+    simulator = CohortSimulator(**simulator_kwargs)
+    trial_data = simulator.run(seed=seed)
+    return trial_data, simulator.final_delta_pmt
+
+
+def simulate_cohort_parallel(
+    n_subjects: int,
+    seed: int,
+    n_workers: int = None,
+    chunk_size: int = 500,
+    **simulator_kwargs,
+):
+    """
+    Spreads the subjects of a cohort over a process pool in chunks of
+    chunk_size and concatenates the results in subject order. Since every
+    subject/day/session has its own stream derived from seed, the output is
+    identical for any number of workers or chunk size.
+    Returns the trial data and the final delta_pmt of each subject.
+    """
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    first_subject_id = simulator_kwargs.pop("first_subject_id", 0)
+
+    chunks = []
+    for start in range(0, n_subjects, chunk_size):
+        chunk_kwargs = dict(
+            simulator_kwargs,
+            n_subjects=min(chunk_size, n_subjects - start),
+            first_subject_id=first_subject_id + start,
+        )
+        chunks.append(chunk_kwargs)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(_simulate_chunk, chunks, [seed] * len(chunks)))
+
+    trial_data = {
+        key: np.concatenate([chunk_data[key] for chunk_data, _ in results])
+        for key in results[0][0]
+    }
+    final_delta_pmt = np.concatenate([delta_pmt for _, delta_pmt in results])
+    return trial_data, final_delta_pmt
+
+
+def to_dataframe(trial_data: dict) -> pd.DataFrame:
+    """Simulated trial data as a DataFrame with decoded categories."""
+    df = pd.DataFrame(trial_data)
+    df["Session type"] = pd.Categorical.from_codes(
+        df["Session type"], categories=session_types
+    )
+    df["response"] = pd.Categorical.from_codes(df["response"], categories=responses)
+    return df
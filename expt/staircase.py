@@ -0,0 +1,131 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from expt.models import SubjectOptionModel, delta_step
+
+
+@dataclass
+class ObserverPopulation:
+    """
+    Simulated observers for the adaptive bonus trials. An observer with
+    threshold s and lapse rate l is correct with probability
+    l / 2 + (1 - l) * Phi(delta / s) on a bonus trial with delta_pmt = delta.
+    """
+
+    thresholds: np.ndarray
+    lapse_rates: np.ndarray
+
+    @classmethod
+    def sample(
+        cls,
+        n_observers: int,
+        median_threshold: float = 2,
+        threshold_log_sd: float = 0.4,
+        max_lapse_rate: float = 0.1,
+        seed=None,
+    ):
+        """Log-normal thresholds and uniform lapse rates."""
+        rng = np.random.default_rng(seed)
+        thresholds = median_threshold * np.exp(
+            threshold_log_sd * rng.standard_normal(n_observers)
+        )
+        lapse_rates = rng.uniform(0, max_lapse_rate, n_observers)
+        return cls(thresholds=thresholds, lapse_rates=lapse_rates)
+
+    def p_correct(self, delta_pmt: np.ndarray) -> np.ndarray:
+        return self.lapse_rates / 2 + (1 - self.lapse_rates) * ndtr(
+            delta_pmt / self.thresholds
+        )
+
+    def target_delta(self, p_target: float) -> np.ndarray:
+        """
+        delta_pmt at which each observer is correct with probability
+        p_target; nan where lapses make p_target unreachable.
+        """
+        p_memory = (p_target - self.lapse_rates / 2) / (1 - self.lapse_rates)
+        with np.errstate(invalid="ignore"):
+            return np.where(p_memory < 1, self.thresholds * ndtri(p_memory), np.nan)
+
+
+def simulate_staircase(
+    observers: ObserverPopulation,
+    a: float = SubjectOptionModel.a,
+    b: float = SubjectOptionModel.b,
+    n_adaptive_trials: int = SubjectOptionModel.n_adaptive_trials,
+    decay_schedule: str = SubjectOptionModel.decay_schedule,
+    delta_start: float = 4,
+    seed=None,
+) -> np.ndarray:
+    """
+    Runs the adapt_delta update rule for n_adaptive_trials bonus trials
+    on all observers at once. Returns each observer's final delta_pmt.
+    """
+    rng = np.random.default_rng(seed)
+    u = rng.random((n_adaptive_trials, len(observers.thresholds)))
+
+    delta_pmt = np.full(len(observers.thresholds), delta_start, dtype=float)
+    for counter in range(1, n_adaptive_trials + 1):
+        correct = u[counter - 1] < observers.p_correct(delta_pmt)
+        delta_pmt += delta_step(counter, correct, a, b, n_adaptive_trials, decay_schedule)
+
+    return delta_pmt
+
+
+def _evaluate_setting(observers, setting, delta_start, seed) -> dict:
+    """Bias and variance of the final delta_pmt for one staircase setting."""
+    final_delta = simulate_staircase(
+        observers, delta_start=delta_start, seed=seed, **setting
+    )
+
+    # a weighted up-down rule converges where P(correct) = b / (a + b)
+    p_target = setting["b"] / (setting["a"] + setting["b"])
+    error = final_delta - observers.target_delta(p_target)
+
+    return dict(
+        setting,
+        p_target=p_target,
+        bias=np.nanmean(error),
+        variance=np.nanvar(error),
+        rmse=np.sqrt(np.nanmean(error ** 2)),
+    )
+
+
+def tune_staircase(
+    observers: ObserverPopulation,
+    a_values=(SubjectOptionModel.a,),
+    b_values=(SubjectOptionModel.b,),
+    n_adaptive_trials_values=(SubjectOptionModel.n_adaptive_trials,),
+    decay_schedules=(SubjectOptionModel.decay_schedule,),
+    delta_start: float = 4,
+    seed: int = 0,
+    n_workers: int = None,
+) -> pd.DataFrame:
+    """
+    Grid search over staircase parameters, one setting per task on a
+    process pool. All settings share the same random draws (seed), so
+    differences between them are not due to simulation noise.
+    """
+    settings = [
+        {"a": a, "b": b, "n_adaptive_trials": n_trials, "decay_schedule": schedule}
+        for a, b, n_trials, schedule in itertools.product(
+            a_values, b_values, n_adaptive_trials_values, decay_schedules
+        )
+    ]
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(
+            executor.map(
+                _evaluate_setting,
+                itertools.repeat(observers),
+                settings,
+                itertools.repeat(delta_start),
+                itertools.repeat(seed),
+            )
+        )
+
+    return pd.DataFrame(results)
@@ -1,11 +1,196 @@
 from dataclasses import dataclass
 from psychopy import visual
+from expt.models import stim_sets
 import random
 
 
+# functions creating each of the twelve shapes, by shape name
+shape_factories = {}
+
+
+def shape_factory(shape_name):
+    """Registers a function creating a shape for a Stimuli instance."""
+
+    def register(factory):
+        shape_factories[shape_name] = factory
+        return factory
+
+    return register
+
+
+@shape_factory("hexagon")
+def _hexagon(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=6,
+        size=stimuli.stimSize,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-hexagon",
+    )
+
+
+@shape_factory("triangle")
+def _triangle(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=3,
+        ori=90,
+        size=stimuli.stimSize * 1.1,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-triangle",
+    )
+
+
+@shape_factory("diamond")
+def _diamond(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=4,
+        size=[stimuli.stimSize, stimuli.stimSize / 2],
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-diamond",
+    )
+
+
+@shape_factory("rectangle")
+def _rectangle(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=4,
+        size=stimuli.stimSize * 1.1,
+        ori=-45,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-rectangle",
+    )
+
+
+@shape_factory("oval")
+def _oval(stimuli):
+    return visual.Circle(
+        win=stimuli.win,
+        units=stimuli.units,
+        radius=[stimuli.stimSize / 4.1, stimuli.stimSize / 2.1],
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        name=f"{stimuli.color}-oval",
+    )
+
+
+@shape_factory("star")
+def _star(stimuli):
+    return visual.ShapeStim(
+        win=stimuli.win,
+        units=stimuli.units,
+        vertices="star7",
+        size=stimuli.stimSize,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        name=f"{stimuli.color}-star",
+    )
+
+
+@shape_factory("cross")
+def _cross(stimuli):
+    return visual.ShapeStim(
+        win=stimuli.win,
+        units=stimuli.units,
+        vertices="cross",
+        size=stimuli.stimSize,
+        ori=45,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        name=f"{stimuli.color}-cross",
+    )
+
+
+@shape_factory("pentagon")
+def _pentagon(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=5,
+        size=stimuli.stimSize * 1.05,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-pentagon",
+    )
+
+
+@shape_factory("circle")
+def _circle(stimuli):
+    return visual.Circle(
+        win=stimuli.win,
+        units=stimuli.units,
+        size=stimuli.stimSize,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-circle",
+    )
+
+
+@shape_factory("heptagon")
+def _heptagon(stimuli):
+    return visual.Polygon(
+        win=stimuli.win,
+        units=stimuli.units,
+        edges=7,
+        size=stimuli.stimSize,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-heptagon",
+    )
+
+
+@shape_factory("plus")
+def _plus(stimuli):
+    return visual.ShapeStim(
+        win=stimuli.win,
+        units=stimuli.units,
+        vertices="cross",
+        size=stimuli.stimSize,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        name=f"{stimuli.color}-plus",
+    )
+
+
+@shape_factory("pacman")
+def _pacman(stimuli):
+    return visual.Pie(
+        win=stimuli.win,
+        units=stimuli.units,
+        size=stimuli.stimSize,
+        start=60,
+        end=-240,
+        lineColor=stimuli.color,
+        fillColor=stimuli.color,
+        colorSpace=stimuli.colorSpace,
+        name=f"{stimuli.color}-pacman",
+    )
+
+
 @dataclass
 class Stimuli:
-    """Generates psychopy shapeStim objects"""
+    """
+    Generates psychopy shapeStim objects. Shapes are only created when
+    first accessed (e.g. stimuli.hexagon), so a color only builds the
+    shapes of the set it is used for.
+    """
 
     win: visual.Window
     color: str
@@ -13,154 +198,24 @@ class Stimuli:
     stimSize: int = 0.3
     units: str = "height"
 
-    def __post_init__(self):
-        # define twelve shapes to choose from
-        self.hexagon = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=6,
-            size=self.stimSize,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-hexagon",
-        )
-
-        self.triangle = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=3,
-            ori=90,
-            size=self.stimSize * 1.1,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-triangle",
-        )
-
-        self.diamond = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=4,
-            size=[self.stimSize, self.stimSize / 2],
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-diamond",
-        )
-
-        self.rectangle = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=4,
-            size=self.stimSize * 1.1,
-            ori=-45,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-rectangle",
-        )
-
-        self.oval = visual.Circle(
-            win=self.win,
-            units=self.units,
-            radius=[self.stimSize / 4.1, self.stimSize / 2.1],
-            lineColor=self.color,
-            fillColor=self.color,
-            name=f"{self.color}-oval",
-        )
-
-        self.star = visual.ShapeStim(
-            win=self.win,
-            units=self.units,
-            vertices="star7",
-            size=self.stimSize,
-            lineColor=self.color,
-            fillColor=self.color,
-            name=f"{self.color}-star",
-        )
-
-        self.cross = visual.ShapeStim(
-            win=self.win,
-            units=self.units,
-            vertices="cross",
-            size=self.stimSize,
-            ori=45,
-            lineColor=self.color,
-            fillColor=self.color,
-            name=f"{self.color}-cross",
-        )
-
-        self.pentagon = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=5,
-            size=self.stimSize * 1.05,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-pentagon",
-        )
-
-        self.circle = visual.Circle(
-            win=self.win,
-            units=self.units,
-            size=self.stimSize,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-circle",
-        )
-
-        self.heptagon = visual.Polygon(
-            win=self.win,
-            units=self.units,
-            edges=7,
-            size=self.stimSize,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-heptagon",
-        )
-
-        self.plus = visual.ShapeStim(
-            win=self.win,
-            units=self.units,
-            vertices="cross",
-            size=self.stimSize,
-            lineColor=self.color,
-            fillColor=self.color,
-            name=f"{self.color}-plus",
-        )
-
-        self.pacman = visual.Pie(
-            win=self.win,
-            units=self.units,
-            size=self.stimSize,
-            start=60,
-            end=-240,
-            lineColor=self.color,
-            fillColor=self.color,
-            colorSpace=self.colorSpace,
-            name=f"{self.color}-pacman",
-        )
+    def __getattr__(self, shape_name):
+        # only called for attributes that are not set yet
+        if shape_name not in shape_factories:
+            raise AttributeError(shape_name)
+
+        shape = shape_factories[shape_name](self)
+        setattr(self, shape_name, shape)
+        return shape
+
+    def get_stims(self, shape_names):
+        # fetch shapes by name, in the given order
+        return [getattr(self, shape_name) for shape_name in shape_names]
 
     def get_stim_set(self, setN):
         # generate a set of three stimulus shapes
         assert setN in ["set1", "set2", "set3", "set4"]
 
-        if setN == "set1":
-            stims = [self.heptagon, self.triangle, self.cross]
-
-        elif setN == "set2":
-            stims = [self.rectangle, self.circle, self.star]
-
-        elif setN == "set3":
-            stims = [self.diamond, self.pentagon, self.oval]
-
-        elif setN == "set4":
-            stims = [self.hexagon, self.plus, self.pacman]
-
+        stims = self.get_stims(stim_sets[setN])
         random.shuffle(stims)
 
         return stims
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+import pandas as pd
+
+# bump when the columns or their types change
+store_schema_version = 1
+
+# column of the store: (column of the session log, type)
+trial_columns = {
+    "subject_id": ("Subject ID", "int32"),
+    "day": ("Day", "int8"),
+    "session_type": ("Session type", "str"),
+    "session_id": ("Session ID", "int8"),
+    "trial_index": ("trial_index", "int16"),
+    "condition": ("Condition", "int16"),
+    "option_a": ("option_a", "int16"),
+    "option_b": ("option_b", "int16"),
+    "response": ("response", "str"),
+    "reaction_time": ("reaction_time", "float64"),
+    "correct": ("correct", "bool"),
+    "reward": ("reward", "float64"),
+    "bonus_trial": ("bonus_trial", "bool"),
+    "delta_pmt": ("delta_pmt", "float64"),
+    "date_time": ("DateTime", "str"),
+}
+
+# queryable, indexed columns that identify a session
+index_columns = ["subject_id", "day", "session_type", "session_id"]
+
+# width of the string columns
+string_sizes = {"session_type": 8, "response": 8, "date_time": 32}
+
+
+def to_trial_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Typed store columns of a session log (e.g. from expt.logger.read_log)."""
+    return pd.DataFrame(
+        {
+            column: df[log_column].astype(dtype)
+            for column, (log_column, dtype) in trial_columns.items()
+        }
+    )
+
+
+@dataclass
+class StudyStore:
+    """
+    Study-wide HDF5 table of every trial of every finished session, in
+    compressed typed columns. Sessions are indexed by subject, day,
+    session type and session id, so slices can be read with a where
+    query without loading the rest of the study.
+    """
+
+    file_path: str = "./data/study.h5"
+    key: str = "trials"
+    complevel: int = 5
+    complib: str = "blosc"
+
+    def _open(self, mode: str = "a") -> pd.HDFStore:
+        return pd.HDFStore(
+            self.file_path, mode=mode, complevel=self.complevel, complib=self.complib
+        )
+
+    def _check_version(self, store: pd.HDFStore) -> None:
+        version = store.get_storer(self.key).attrs.schema_version
+        if version != store_schema_version:
+            raise ValueError(
+                f"{self.file_path} has schema version {version}, "
+                f"expected {store_schema_version}!"
+            )
+
+    def append_session(self, df: pd.DataFrame) -> None:
+        """
+        Appends the trials of a finished session. A session that is stored
+        already (e.g. saved again after resuming) has its rows replaced.
+        """
+        trials = to_trial_table(df)
+        session = {column: trials[column].tolist()[0] for column in index_columns}
+        where = " & ".join(f"{column} == {value!r}" for column, value in session.items())
+
+        with self._open() as store:
+            if self.key in store:
+                self._check_version(store)
+                if store.remove(self.key, where=where):
+                    print(f"\nSession {session} was already stored, replacing it.\n")
+
+            store.append(
+                self.key,
+                trials,
+                format="table",
+                data_columns=index_columns,
+                min_itemsize=string_sizes,
+                index=True,
+            )
+            store.get_storer(self.key).attrs.schema_version = store_schema_version
+
+    def select(self, where=None, columns=None) -> pd.DataFrame:
+        """
+        Trials matching a where query, e.g. 'subject_id == 3 & day == 2',
+        read directly from the indexed table.
+        """
+        with self._open(mode="r") as store:
+            self._check_version(store)
+            return store.select(self.key, where=where, columns=columns)
+
+    def sessions(self) -> pd.DataFrame:
+        """Subject, day, session type and id of every stored session."""
+        return self.select(columns=index_columns).drop_duplicates(ignore_index=True)
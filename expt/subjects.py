@@ -0,0 +1,154 @@
+from contextlib import closing
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import sqlite3
+import pandas as pd
+
+# bump when the tables change; stored as the database's user_version
+subject_store_version = 1
+
+schema = """
+CREATE TABLE IF NOT EXISTS subjects (
+    subject_id INTEGER PRIMARY KEY,
+    assignment TEXT NOT NULL,
+    study_seed INTEGER NOT NULL,
+    registered_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE TABLE IF NOT EXISTS delta_pmt (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject_id INTEGER NOT NULL,
+    delta_pmt REAL NOT NULL,
+    day INTEGER,
+    session_type TEXT,
+    session_id INTEGER,
+    recorded_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS delta_pmt_subject ON delta_pmt (subject_id, id);
+CREATE TABLE IF NOT EXISTS completed_sessions (
+    subject_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    session_type TEXT NOT NULL,
+    session_id INTEGER NOT NULL,
+    date_time TEXT,
+    completed_at TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (subject_id, day, session_type, session_id)
+);
+"""
+
+
+@dataclass
+class SubjectStore:
+    """
+    SQLite store of per-subject state: option assignment and study seed,
+    the history of delta_pmt, and completed sessions. Each operation is
+    one transaction on its own connection in WAL mode, so several
+    experiment processes can read and write at once; writers wait up
+    to timeout seconds for each other. All lookups are by indexed keys.
+    """
+
+    db_path: str = "./data/subjects.db"
+    timeout: float = 30
+
+    def __post_init__(self):
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in [0, subject_store_version]:
+                raise ValueError(
+                    f"{self.db_path} has schema version {version}, "
+                    f"expected {subject_store_version}!"
+                )
+            with connection:
+                connection.executescript(schema)
+                connection.execute(f"PRAGMA user_version = {subject_store_version}")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=self.timeout)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = FULL")
+        return connection
+
+    def _execute(self, query: str, parameters=()) -> list:
+        """Runs a query as one transaction and returns its rows."""
+        with closing(self._connect()) as connection:
+            with connection:
+                return connection.execute(query, parameters).fetchall()
+
+    def register_subject(self, subject_id: int, assignment: list, study_seed: int) -> None:
+        """
+        Records a subject's option assignment on their first session and
+        checks that later sessions use the same one.
+        """
+        self._execute(
+            "INSERT OR IGNORE INTO subjects (subject_id, assignment, study_seed) "
+            "VALUES (?, ?, ?)",
+            (int(subject_id), json.dumps(assignment), int(study_seed)),
+        )
+        if self.assignment(subject_id) != json.loads(json.dumps(assignment)):
+            raise ValueError(f"Subject {subject_id} was assigned different options!")
+
+    def assignment(self, subject_id: int) -> list:
+        rows = self._execute(
+            "SELECT assignment FROM subjects WHERE subject_id = ?", (int(subject_id),)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def study_seed(self, subject_id: int) -> int:
+        rows = self._execute(
+            "SELECT study_seed FROM subjects WHERE subject_id = ?", (int(subject_id),)
+        )
+        return rows[0][0] if rows else None
+
+    def record_delta_pmt(
+        self, subject_id: int, delta_pmt: float, day=None, session_type=None, session_id=None
+    ) -> None:
+        self._execute(
+            "INSERT INTO delta_pmt (subject_id, delta_pmt, day, session_type, session_id) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                int(subject_id),
+                float(delta_pmt),
+                None if day is None else int(day),
+                session_type,
+                None if session_id is None else int(session_id),
+            ),
+        )
+
+    def latest_delta_pmt(self, subject_id: int) -> float:
+        """Most recently recorded delta_pmt of a subject, or None."""
+        rows = self._execute(
+            "SELECT delta_pmt FROM delta_pmt WHERE subject_id = ? ORDER BY id DESC LIMIT 1",
+            (int(subject_id),),
+        )
+        return rows[0][0] if rows else None
+
+    def delta_pmt_history(self, subject_id: int) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(
+                "SELECT delta_pmt, day, session_type, session_id, recorded_at "
+                "FROM delta_pmt WHERE subject_id = ? ORDER BY id",
+                connection,
+                params=(int(subject_id),),
+            )
+
+    def complete_session(
+        self, subject_id: int, day: int, session_type: str, session_id: int, date_time=None
+    ) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO completed_sessions "
+            "(subject_id, day, session_type, session_id, date_time) VALUES (?, ?, ?, ?, ?)",
+            (int(subject_id), int(day), session_type, int(session_id), date_time),
+        )
+
+    def completed_sessions(self, subject_id: int) -> list:
+        """
+        (day, session type, session id) of each completed session of a
+        subject, in the order they were completed. completed_at only has
+        one second resolution, so rows are ordered by insertion (rowid).
+        """
+        return self._execute(
+            "SELECT day, session_type, session_id FROM completed_sessions "
+            "WHERE subject_id = ? ORDER BY rowid",
+            (int(subject_id),),
+        )
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+import os
+from typing import Iterable, Tuple
+from psychopy import visual
+from expt.input import ScriptedInput
+from expt.options import SubjectSpecificOptions
+from expt.routines import DayRoutine
+from expt.store import StudyStore
+from expt.subjects import SubjectStore
+from expt.timing import FrameScheduler
+
+
+@dataclass
+class VirtualTime:
+    """Shared simulated time, in seconds, advanced by the window's flips."""
+
+    now: float = 0.0
+
+    def getTime(self) -> float:
+        return self.now
+
+    def advance(self, duration: float) -> None:
+        self.now += duration
+
+
+class VirtualClock:
+    """psychopy Clock interface on top of a VirtualTime."""
+
+    def __init__(self, virtual_time: VirtualTime):
+        self.virtual_time = virtual_time
+        self._time_at_last_reset = virtual_time.now
+
+    def getTime(self) -> float:
+        return self.virtual_time.now - self._time_at_last_reset
+
+    def getLastResetTime(self) -> float:
+        return self._time_at_last_reset
+
+    def reset(self, newT: float = 0.0) -> None:
+        self._time_at_last_reset = self.virtual_time.now + newT
+
+
+class WarpWindow(visual.Window):
+    """
+    Window whose flips don't wait for the screen: each flip advances the
+    virtual time by one refresh and returns the virtual flip time, so a
+    day of fixed-duration phases runs as fast as it can be drawn.
+    Hidden unless visible is set.
+    """
+
+    def __init__(
+        self, virtual_time: VirtualTime, refresh_rate: float = 60, visible=False, **kwargs
+    ):
+        # set before the base class, which flips while it initializes
+        self.virtual_time = virtual_time
+        self.refresh_rate = refresh_rate
+
+        window_kwargs = {
+            "size": [480, 270],
+            "fullscr": False,
+            "units": "pix",
+            "color": (-1, -1, -1),
+            "allowGUI": False,
+            "waitBlanking": False,
+        }
+        window_kwargs.update(kwargs)
+        super().__init__(**window_kwargs)
+        if not visible:
+            self.winHandle.set_visible(False)
+
+    def getActualFrameRate(self, *args, **kwargs) -> float:
+        return self.refresh_rate
+
+    def flip(self, clearBuffer=True) -> float:
+        # callOnFlip functions run in the base flip, at the new time
+        self.virtual_time.advance(1 / self.refresh_rate)
+        super().flip(clearBuffer=clearBuffer)
+        return self.virtual_time.now
+
+
+def run_time_warped_day(
+    experiment_info: dict,
+    data_dir: str,
+    responses: Iterable[Tuple[str, float]] = (),
+    refresh_rate: float = 60,
+    render_mode: str = "vector",
+    visible: bool = False,
+) -> DayRoutine:
+    """
+    Runs a full experiment day, with its data handlers and files, on a
+    virtual clock: trials are answered by the scripted (key, rt)
+    responses (then by the default response) and screens are passed
+    automatically. All files, including the study and subject stores,
+    are written to data_dir, which should not be the study's data
+    directory. Returns the finished day routine.
+    """
+    virtual_time = VirtualTime()
+    win = WarpWindow(virtual_time, refresh_rate=refresh_rate, visible=visible)
+
+    day_routine = DayRoutine(
+        win=win,
+        choice_options=SubjectSpecificOptions(
+            win=win, subject_id=experiment_info["Subject ID"]
+        ),
+        experiment_info=experiment_info,
+        render_mode=render_mode,
+        data_dir=data_dir,
+        study_store=StudyStore(os.path.join(data_dir, "study.h5")),
+        subject_store=SubjectStore(os.path.join(data_dir, "subjects.db")),
+        input_backend=ScriptedInput(
+            responses=responses, clock=VirtualClock(virtual_time)
+        ),
+        frame_scheduler=FrameScheduler(
+            win, refresh_rate=refresh_rate, clock=virtual_time
+        ),
+    )
+    day_routine.run()
+    win.close()
+
+    return day_routine
@@ -0,0 +1,80 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+from psychopy import core, visual
+
+
+@dataclass
+class FrameScheduler:
+    """
+    Presents trial phases for an exact number of screen refreshes and
+    timestamps every flip. A flip that comes more than 1.5 frames after
+    the previous one of a continuous presentation counts as dropped frames.
+    Background tasks queued with schedule() run in the time left between
+    a flip and the next refresh. The clock must share the timebase of the
+    window's flip timestamps (e.g. a virtual clock for tests).
+    """
+
+    win: visual.Window
+    refresh_rate: float = None
+    clock: core.Clock = None
+    task_margin: float = 0.004  # frame time kept free for drawing, in seconds
+
+    def __post_init__(self):
+        if self.refresh_rate is None:
+            self.refresh_rate = self.win.getActualFrameRate() or 60
+        if self.clock is None:
+            self.clock = core.monotonicClock
+        self.frame_duration = 1 / self.refresh_rate
+        self.last_flip = None
+        self.tasks = deque()
+        self.start_trial()
+
+    def start_trial(self) -> None:
+        """Resets the per-trial timing log."""
+        self.dropped_frames = 0
+        self.n_flips = 0
+
+    def n_frames(self, duration: float) -> int:
+        """Number of refreshes closest to a duration in seconds."""
+        return max(1, round(duration * self.refresh_rate))
+
+    def flip(self) -> float:
+        """Flips the window and returns the flip timestamp."""
+        flip_time = self.win.flip()
+        if self.last_flip is not None:
+            n_intervals = round((flip_time - self.last_flip) / self.frame_duration)
+            if flip_time - self.last_flip > 1.5 * self.frame_duration:
+                self.dropped_frames += n_intervals - 1
+
+        self.last_flip = flip_time
+        self.n_flips += 1
+        return flip_time
+
+    def pause(self) -> None:
+        """
+        Marks a deliberate gap in flipping (e.g. while waiting for a
+        response) so that it is not counted as dropped frames.
+        """
+        self.last_flip = None
+
+    def schedule(self, task: Callable) -> None:
+        """Queues a task to run in spare frame time."""
+        self.tasks.append(task)
+
+    def run_tasks(self, force: bool = False) -> None:
+        """
+        Runs queued tasks in order while the current frame has time to
+        spare, or all of them if force is set.
+        """
+        while self.tasks:
+            if not force:
+                if self.last_flip is None:
+                    break
+                deadline = self.last_flip + self.frame_duration - self.task_margin
+                if self.clock.getTime() > deadline:
+                    break
+            self.tasks.popleft()()
+
+    def trial_log(self) -> dict:
+        return {"dropped_frames": self.dropped_frames, "n_flips": self.n_flips}
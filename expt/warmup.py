@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+import time
+from typing import List, Tuple
+from pyglet import gl
+from psychopy import visual
+
+
+@dataclass
+class WarmUp:
+    """
+    Draws every stimulus of the day once behind a black screen, so GL
+    resources are uploaded, shaders compiled and glyphs laid out before
+    the first trial. Each stimulus is drawn twice; the first draw gives
+    its warm-up cost, and a second draw slower than hitch_threshold
+    (seconds) means the stimulus still hitches after warming up.
+    """
+
+    win: visual.Window
+    hitch_threshold: float = 0.002
+
+    def _time_draw(self, stim) -> float:
+        start = time.perf_counter()
+        stim.draw()
+        gl.glFinish()
+        duration = time.perf_counter() - start
+        self.win.clearBuffer()
+        return duration
+
+    def run(self, stims: List[Tuple[str, object]]) -> List[dict]:
+        """Warms up named stimuli and returns the draw time of each."""
+        # keep a black screen up while drawing into the back buffer
+        self.win.flip()
+
+        report = []
+        for name, stim in stims:
+            first_draw = self._time_draw(stim)
+            second_draw = self._time_draw(stim)
+            report.append(
+                {
+                    "stimulus": name,
+                    "first_draw": first_draw,
+                    "second_draw": second_draw,
+                    "hitch": second_draw > self.hitch_threshold,
+                }
+            )
+
+        self.win.flip()
+        return report
+
+
+def print_warm_up_report(report: List[dict]) -> None:
+    """Prints the warm-up cost and any stimulus that still hitches."""
+    total = sum(entry["first_draw"] for entry in report)
+    print(f"\nWarmed up {len(report)} stimuli in {1000 * total:.1f} ms")
+    for entry in report:
+        if entry["hitch"]:
+            print(
+                f"Stimulus {entry['stimulus']} still takes "
+                f"{1000 * entry['second_draw']:.2f} ms to draw after warm-up!"
+            )
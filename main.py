@@ -1,5 +1,6 @@
 from psychopy import visual, data
 from expt.info import display_config_window, get_config_info
+from expt.input import input_backends
 from expt.options import SubjectSpecificOptions
 from expt.routines import DayRoutine, TrainingSession
 
@@ -7,13 +8,23 @@ if __name__ == "__main__":
     # initialize info to begin experiment for the day
     dialog_window = display_config_window()
     experiment_info = get_config_info(dialog_window)
+    resume = experiment_info.pop("Resume")
+    stratify_rewards = experiment_info.pop("Stratify rewards")
+    input_backend = input_backends[experiment_info.pop("Input")]()
 
     # create window for experiment
     win = visual.Window([1920, 1080], fullscr=True, units="pix", color=(-1, -1, -1))
 
     # create all stimuli
-    choice_options = SubjectSpecificOptions(win=win)
+    choice_options = SubjectSpecificOptions(win=win, subject_id=experiment_info["Subject ID"])
 
     # session routine
-    day_routine = DayRoutine(win=win, choice_options=choice_options, experiment_info=experiment_info)
+    day_routine = DayRoutine(
+        win=win,
+        choice_options=choice_options,
+        experiment_info=experiment_info,
+        resume=resume,
+        stratify_rewards=stratify_rewards,
+        input_backend=input_backend,
+    )
     day_routine.run()
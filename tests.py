@@ -1,12 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
 import itertools
+import json
 import os
+import tempfile
+import numpy as np
 import pandas as pd
-from psychopy import visual, data
-from expt.options import SubjectSpecificOptions, create_choice_options
+from scipy.special import ndtr
+from psychopy import data
+from expt.atlas import StimulusAtlas
+from expt.models import SubjectOptionModel, simulate_trial
+from expt.options import SubjectSpecificOptions
+from expt.conditions import TrialSequence, day_sessions
+from expt.simulation import (
+    CohortSimulator,
+    NoisyMemoryPolicy,
+    simulate_cohort_parallel,
+    to_dataframe,
+)
+from expt.checkpoint import Checkpoint
+from expt.loader import DataLoader
+from expt.logger import TrialLogger, read_log, rebuild_csv
+from expt.plans import DayPlan, option_assignment
+from expt.power import PowerAnalysis
+from expt.rewards import RewardSchedule
+from expt.rng import counter_generator, session_key
+from expt.replay import replay_session, replay_trials
+from expt.staircase import ObserverPopulation, simulate_staircase, tune_staircase
+from expt.store import StudyStore
+from expt.subjects import SubjectStore
+from expt.input import ScriptedInput
 from expt.routines import TrialRoutine
-from expt.conditions import TrialSequence
+from expt.timing import FrameScheduler
+from expt.timewarp import VirtualClock, VirtualTime, WarpWindow
 from expt.info import (
-    get_config_info,
     load_subject_delta_pmt,
     save_subject_delta_pmt,
     set_file_path,
@@ -21,6 +47,7 @@ def simulate_experiments() -> pd.DataFrame:
     Runs experiments for n_subjects, n_sessions with automated
     responses and stores data to test validity of trials generated.
     Returns data re. choice options for each subject.
+    Runs on the window-free option model, so no display is needed.
     """
 
     subject_ids = list(range(n_subjects))
@@ -30,23 +57,28 @@ def simulate_experiments() -> pd.DataFrame:
     # initialize options dataframe
     df_options = pd.DataFrame()
 
-    for config_info in itertools.product(subject_ids, session_ids, session_types):
+    for subject_id, session_id, session_type in itertools.product(
+        subject_ids, session_ids, session_types
+    ):
 
         # initialize info to begin session
-        experiment_info = get_config_info(config_info)
+        experiment_info = {
+            "Subject ID": subject_id,
+            "Day": 1,
+            "Session type": session_type,
+            "Session ID": session_id,
+            "DateTime": data.getDateStr(),
+        }
         file_path = set_file_path(experiment_info)
 
-        # create window for experiment
-        win = visual.Window([1024, 768], fullscr=False, units="pix")
-
-        # create all stimuli
-        choice_options = SubjectSpecificOptions(win=win)
+        # create all options, assigned from the subject's own stream
+        choice_options = SubjectOptionModel(subject_id=subject_id)
 
         # collect option data
         option_rewards = [
             option.meanReward for option in choice_options.all_options[:12]
         ]
-        option_type = [option.shape.name for option in choice_options.all_options[:12]]
+        option_type = [option.name for option in choice_options.all_options[:12]]
 
         df_options_aux = pd.DataFrame(
             {
@@ -58,16 +90,13 @@ def simulate_experiments() -> pd.DataFrame:
                 "Option reward": option_rewards,
             }
         )
-        df_options = df_options.append(df_options_aux)
+        df_options = pd.concat([df_options, df_options_aux])
 
-        # initialize trial conditions and routine
+        # initialize trial conditions
         trial_conditions = TrialSequence(
             session_type=experiment_info["Session type"],
             session_id=experiment_info["Session ID"],
         ).generate()
-        trial_routine = TrialRoutine(
-            win=win, all_choice_options=choice_options.all_options
-        )
 
         # trial and experiment data handlers
         trials = data.TrialHandler(
@@ -80,8 +109,7 @@ def simulate_experiments() -> pd.DataFrame:
 
         # run sequence of trials
         for this_trial in trials:
-            trial_routine.set_condition(condition=this_trial)
-            trial_data = trial_routine.simulate_wo_user_input()
+            trial_data = simulate_trial(choice_options.all_options, this_trial)
 
             for data_key, data_value in trial_data.items():
                 trials.addData(data_key, data_value)
@@ -110,8 +138,6 @@ def simulate_experiments() -> pd.DataFrame:
             # indicate end of trial to experiment handler
             this_exp.nextEntry()
 
-        win.close()
-
     return df_options
 
 
@@ -132,7 +158,7 @@ def test_same_options_for_subject(df_options):
                     ].unique()
                 )
             ]
-    assert all(test_len) == 1, "Options are not the same within subject!"
+    assert all(n == 1 for n in test_len), "Options are not the same within subject!"
 
     # manually checked whether option colors, shapes, and sets
     # were shuffled across subjects
@@ -148,13 +174,8 @@ def test_subject_session_shuffle():
         - for the same session type, and
         - for different sessions type
     """
-    # extract all data
-    df = pd.DataFrame()
-    for file in os.listdir("./data/"):
-        if file.endswith(".csv"):
-            aux = pd.read_csv("./data/" + file)
-            df = df.append(aux)
-    df.reset_index(inplace=True)
+    # extract all data, parsing only files added since the last load
+    df = DataLoader(data_dir="./data").load()
 
     # test fully random shuffle
     # for now, I've checked manually LOL
@@ -163,7 +184,476 @@ def test_subject_session_shuffle():
     return df
 
 
+def test_atlas_positions():
+    """
+    Function to test that the pre-rendered images of an option are
+    drawn where the option itself would be, i.e. left and right.
+    """
+    win = WarpWindow(VirtualTime())
+    atlas = StimulusAtlas(win)
+    all_options = SubjectSpecificOptions(win=win, subject_id=1).all_options
+
+    # a shape and a bonus option
+    for option in [all_options[0], all_options[12]]:
+        pos = {}
+        for side in ["left", "right"]:
+            pos[side] = atlas.image(option, side).pos
+        assert pos["left"][0] < 0 < pos["right"][0], "Images overlap!"
+        assert np.allclose(pos["right"], [0.35 * win.size[1], 0])
+    win.close()
+    return
+
+
+def test_trial_state_machine():
+    """
+    Function to test frame by frame, on a virtual clock at 60 Hz, that a
+    trial goes through fixation, choice until the scripted response,
+    feedback and ITI, and that only slow responses (rt > 3 s) get the
+    respond faster text during feedback.
+    """
+    virtual_time = VirtualTime()
+    win = WarpWindow(virtual_time, refresh_rate=60)
+    trial_routine = TrialRoutine(
+        win=win,
+        all_choice_options=SubjectSpecificOptions(win=win, subject_id=1).all_options,
+        frame_scheduler=FrameScheduler(win, refresh_rate=60, clock=virtual_time),
+        input_backend=ScriptedInput(
+            responses=[("left", 0.51), ("right", 3.51)],
+            clock=VirtualClock(virtual_time),
+        ),
+    )
+
+    # record the state of every flip and of every respond faster draw
+    states, respond_faster_states = [], []
+    flip = trial_routine.frame_scheduler.flip
+
+    def recording_flip():
+        states.append(trial_routine.state)
+        return flip()
+
+    def recording_draw():
+        respond_faster_states.append(trial_routine.state)
+
+    trial_routine.frame_scheduler.flip = recording_flip
+    trial_routine.respond_faster_text.shape.draw = recording_draw
+
+    trial_conditions = TrialSequence(session_type="training", session_id=0).generate()
+    for trial_index, (rt, n_choice_frames) in enumerate([(0.51, 32), (3.51, 212)]):
+        states.clear()
+        respond_faster_states.clear()
+        trial_routine.set_condition(trial_conditions[trial_index], trial_index)
+        trial_data = trial_routine.run()
+
+        # choice frames until the first poll at or after rt from choice onset
+        assert states == (
+            ["fixation"] * 60 + ["choice"] * n_choice_frames + ["feedback"] * 60 + ["iti"] * 60
+        ), "Unexpected state transitions!"
+        assert trial_routine.state == "done"
+        assert trial_data["reaction_time"] == rt
+        assert trial_data["dropped_frames"] == 0
+        assert respond_faster_states == ([] if rt <= 3 else ["feedback"] * 60)
+    win.close()
+    return
+
+
+def test_trial_sequence_batch():
+    """
+    Function to test that batch-generated trial sequences follow the
+    session design for every session type, i.e. condition counts,
+    option pairs, and bonus trials placed right after their regular trial.
+    """
+    for session_type in ["practice", "training", "testing"]:
+        trial_sequence = TrialSequence(session_type=session_type, session_id=0)
+        sequences = trial_sequence.generate_batch(n_sequences=1000)
+        assert sequences.shape == (1000, trial_sequence.n_trials)
+        trial_sequence.validate(sequences)
+    return
+
+
+def test_cohort_simulation():
+    """
+    Function to test that the vectorized cohort simulation runs every
+    session of both days for every subject and records the same trial
+    columns as the experiment.
+    """
+    simulator = CohortSimulator(n_subjects=50, policy=NoisyMemoryPolicy())
+    df = to_dataframe(simulator.run(seed=0))
+
+    n_sessions = df.groupby(["Subject ID", "Day", "Session type", "Session ID"]).ngroups
+    assert n_sessions == 50 * (len(day_sessions[1]) + len(day_sessions[2]))
+    for column in [
+        "Condition", "option_a", "option_b", "response", "reaction_time", "delta_pmt"
+    ]:
+        assert column in df.columns
+    assert set(df["response"]) <= {"left", "right"}
+    assert df.loc[df["bonus_trial"], "Condition"].min() > 11
+
+    # delta_pmt only changes within the adaptive testing session of day 1
+    n_deltas = (
+        df.groupby(["Subject ID", "Day", "Session type", "Session ID"], observed=True)
+        ["delta_pmt"]
+        .nunique()
+        .reset_index()
+    )
+    adaptive = (
+        (n_deltas["Day"] == 1)
+        & (n_deltas["Session type"] == "testing")
+        & (n_deltas["Session ID"] == 0)
+    )
+    assert (n_deltas.loc[adaptive, "delta_pmt"] > 1).all()
+    assert (n_deltas.loc[~adaptive, "delta_pmt"] == 1).all()
+    return
+
+
+def test_parallel_simulation_reproducible():
+    """
+    Function to test that parallel simulations match the serial
+    simulation bit-for-bit whatever the number of workers and chunks.
+    """
+    serial_data = CohortSimulator(n_subjects=20).run(seed=1)
+    for n_workers, chunk_size in [(1, 20), (2, 7)]:
+        parallel_data, _ = simulate_cohort_parallel(
+            n_subjects=20, seed=1, n_workers=n_workers, chunk_size=chunk_size
+        )
+        for key, values in serial_data.items():
+            assert np.array_equal(values, parallel_data[key]), f"{key} differs!"
+    return
+
+
+def test_power_analysis():
+    """
+    Function to test that a power analysis cell stops early once its
+    Wilson interval is narrow enough, and is read from the cache for the
+    same settings but simulated again when a setting changes.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # an effect so large that every cohort is significant
+        power_analysis = PowerAnalysis(
+            policy=NoisyMemoryPolicy(stakes_gain=3),
+            batch_size=50,
+            min_cohorts=100,
+            max_cohorts=5000,
+            cache_dir=cache_dir,
+        )
+        cell = power_analysis.run_cell(n_subjects=30, n_sessions=2)
+        assert cell["n_cohorts"] == 100, "Power analysis did not stop early!"
+        assert cell["power"] == 1
+        assert (cell["ci_high"] - cell["ci_low"]) / 2 <= power_analysis.ci_half_width
+
+        # overwrite the cached cell to see whether it is read back
+        (cache_file,) = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir)]
+        with open(cache_file, "w") as f:
+            json.dump(dict(cell, power=-1), f)
+        assert power_analysis.run_cell(n_subjects=30, n_sessions=2)["power"] == -1
+
+        power_analysis.alpha = 0.01
+        assert power_analysis.run_cell(n_subjects=30, n_sessions=2)["power"] == 1
+        assert len(os.listdir(cache_dir)) == 2
+    return
+
+
+def test_staircase_tuning():
+    """
+    Function to test that staircase simulations are reproducible for a
+    fixed seed, and that the tuned staircase brings observers close to
+    its target accuracy b / (a + b).
+    """
+    observers = ObserverPopulation.sample(200, seed=0)
+    assert np.array_equal(
+        simulate_staircase(observers, seed=1), simulate_staircase(observers, seed=1)
+    )
+
+    df = tune_staircase(
+        observers,
+        a_values=(0.16, 0.3),
+        b_values=(0.84, 0.7),
+        n_adaptive_trials_values=(100,),
+        seed=0,
+        n_workers=2,
+    )
+    assert df.equals(
+        tune_staircase(
+            observers,
+            a_values=(0.16, 0.3),
+            b_values=(0.84, 0.7),
+            n_adaptive_trials_values=(100,),
+            seed=0,
+            n_workers=1,
+        )
+    )
+
+    best = df.loc[df["rmse"].idxmin()]
+    final_delta = simulate_staircase(
+        observers, a=best["a"], b=best["b"], n_adaptive_trials=100, seed=0
+    )
+    p_correct = observers.p_correct(final_delta).mean()
+    assert abs(p_correct - best["p_target"]) < 0.03, "Staircase did not converge!"
+    assert abs(best["bias"]) < 0.25
+    return
+
+
+def test_stratified_rewards():
+    """
+    Function to test that stratified reward noise is balanced for every
+    option: its mean is within the schedule's tolerance, and draws that
+    were not re-centred fall one in each equiprobable stratum.
+    """
+    trial_conditions = TrialSequence(session_type="testing", session_id=1).generate()
+    option_ids = np.array([[t["option_a"], t["option_b"]] for t in trial_conditions])
+    reward_schedule = RewardSchedule(
+        trial_conditions, session_key(4, 1, "testing", 1), stratify=True
+    )
+
+    for option_id in np.unique(option_ids):
+        noise = reward_schedule.noise[option_ids == option_id]
+        assert abs(noise.mean()) <= reward_schedule.tolerance, f"Option {option_id}!"
+        strata = np.floor(ndtr(noise) * len(noise)).astype(int)
+        re_centred = np.isclose(noise.mean(), 0)
+        assert re_centred or (sorted(strata) == list(range(len(noise))))
+    return
+
+
+def test_session_replay():
+    """
+    Function to test that replaying a session log reproduces its
+    conditions, rewards and adaptive delta_pmt with the reward
+    stratification and adaptive method it logged, and that a tampered
+    reward shows up in the diff report.
+    """
+    n_trials = TrialSequence(session_type="testing", session_id=0).n_trials
+    responses = np.random.default_rng(0).choice(["left", "right"], n_trials)
+    for stratify_rewards, adaptive_method in [(False, "staircase"), (True, "quest")]:
+        df = pd.DataFrame(
+            {
+                "response": responses,
+                "Subject ID": 7,
+                "Day": 1,
+                "Session type": "testing",
+                "Session ID": 0,
+                "stratify_rewards": stratify_rewards,
+                "adaptive_method": adaptive_method,
+            }
+        )
+        replayed, _ = replay_trials(df)
+        df = pd.concat([df, replayed], axis=1)
+        assert replayed["delta_pmt"].nunique() > 1, "delta_pmt was not adapted!"
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            file_path = os.path.join(data_dir, "session.csv")
+            df.to_csv(file_path, index=False)
+            summary, diffs = replay_session(file_path)
+            assert summary["n_differences"] == 0, diffs
+
+            # replaying with the other settings would not match
+            settings = ["stratify_rewards", "adaptive_method"]
+            df.drop(columns=settings).to_csv(file_path, index=False)
+            if stratify_rewards:
+                assert replay_session(file_path)[0]["n_differences"] > 0
+
+            df.loc[3, "reward"] += 1
+            df.to_csv(file_path, index=False)
+            _, diffs = replay_session(file_path)
+            assert list(zip(diffs["trial"], diffs["column"])) == [(3, "reward")]
+    return
+
+
+def test_day_plan_roundtrip():
+    """
+    Function to test that a compiled day plan survives saving and
+    loading, and holds the same trials, reward noise and payoff trials
+    that the sessions would draw at runtime.
+    """
+    with tempfile.TemporaryDirectory() as plan_dir:
+        plan = DayPlan.load(DayPlan.compile(subject_id=3, day=2).save(plan_dir))
+
+    assert [(s.session_type, s.session_id) for s in plan.sessions] == day_sessions[2]
+    for session in plan.sessions:
+        rng_key = session_key(3, 2, session.session_type, session.session_id)
+        trial_conditions = TrialSequence(
+            session_type=session.session_type, session_id=session.session_id
+        ).generate(rng=counter_generator(rng_key, stream="sequence"))
+        assert session.trial_conditions == trial_conditions
+        assert np.array_equal(
+            session.reward_noise, RewardSchedule(trial_conditions, rng_key).noise
+        )
+        assert np.array_equal(
+            session.payoff_trial_index,
+            counter_generator(rng_key, stream="payoff").choice(
+                len(trial_conditions), size=2, replace=False
+            ),
+        )
+    return
+
+
+def test_trial_logger():
+    """
+    Function to test that the trial log keeps every record in order,
+    survives a record cut off by a crash, also when the session is
+    resumed, and rebuilds the session csv.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        log_path = os.path.join(data_dir, "session.jsonl")
+        trial_logger = TrialLogger(log_path, fsync_every=7)
+        for trial_index in range(50):
+            trial_logger.log(
+                {"trial_index": trial_index, "correct": np.bool_(trial_index % 2)}
+            )
+        trial_logger.close()
+
+        with open(log_path, "a") as f:
+            f.write('{"trial_index": 50, "corr')
+        df = rebuild_csv(log_path, os.path.join(data_dir, "session.csv"))
+        assert df["trial_index"].tolist() == list(range(50))
+        assert pd.read_csv(os.path.join(data_dir, "session.csv")).equals(read_log(log_path))
+
+        # resume after the crash and log the rest of the session
+        trial_logger = TrialLogger(log_path)
+        for trial_index in range(50, 60):
+            trial_logger.log({"trial_index": trial_index, "correct": True})
+        trial_logger.close()
+        df = rebuild_csv(log_path, os.path.join(data_dir, "session.csv"))
+        assert df["trial_index"].tolist() == list(range(60)), "Trials were lost on resume!"
+
+        # a failing task is reported, and a failing write is raised
+        def failing_task():
+            raise OSError("disk full")
+
+        trial_logger = TrialLogger(log_path)
+        trial_logger.after_sync(failing_task)
+        trial_logger.log({"trial_index": 60})
+        trial_logger.log({"trial_index": object()})
+        try:
+            trial_logger.close()
+            assert False, "Logging failed silently!"
+        except RuntimeError:
+            pass
+        assert read_log(log_path)["trial_index"].tolist()[-1] == 60
+    return
+
+
+def test_checkpoint_resume():
+    """
+    Function to test that a checkpoint restores the adaptive state
+    exactly, so a resumed adaptive session continues as if it had
+    never stopped.
+    """
+    outcomes = np.random.default_rng(0).random(20) < 0.7
+    for adaptive_method in ["staircase", "quest"]:
+        model = SubjectOptionModel(subject_id=5, adaptive_method=adaptive_method)
+        for correct in outcomes[:8]:
+            model.adapt_delta(correct)
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            assert Checkpoint.load(5, 1, checkpoint_dir=checkpoint_dir) is None
+            checkpoint = Checkpoint(5, 1, checkpoint_dir=checkpoint_dir)
+            checkpoint.state["adaptive_state"] = model.adaptive_state()
+            checkpoint.save()
+            resumed = SubjectOptionModel(subject_id=5, adaptive_method=adaptive_method)
+            resumed.restore_adaptive_state(
+                Checkpoint.load(5, 1, checkpoint_dir=checkpoint_dir).state["adaptive_state"]
+            )
+
+        for correct in outcomes[8:]:
+            model.adapt_delta(correct)
+            resumed.adapt_delta(correct)
+        assert np.array_equal(model.mean_rewards, resumed.mean_rewards)
+        assert model.delta_pmt == resumed.delta_pmt
+    return
+
+
+def test_study_store():
+    """
+    Function to test that sessions appended to the study store are
+    read back typed and by subject/session query, and only once.
+    """
+    n_trials = TrialSequence(session_type="testing", session_id=1).n_trials
+    with tempfile.TemporaryDirectory() as data_dir:
+        study_store = StudyStore(os.path.join(data_dir, "study.h5"))
+        for subject_id in [1, 2]:
+            df = pd.DataFrame(
+                {
+                    "response": ["left"] * n_trials,
+                    "reaction_time": 0.5,
+                    "trial_index": range(n_trials),
+                    "Subject ID": subject_id,
+                    "Day": 1,
+                    "Session type": "testing",
+                    "Session ID": 1,
+                    "DateTime": data.getDateStr(),
+                }
+            )
+            replayed, _ = replay_trials(df)
+            study_store.append_session(pd.concat([df, replayed], axis=1))
+
+        assert len(study_store.sessions()) == 2
+        trials = study_store.select("subject_id == 2 & session_type == 'testing'")
+        assert len(trials) == n_trials
+        assert trials["reward"].dtype == np.float64
+
+        # storing a session again replaces it
+        replayed["reward"] += 1
+        study_store.append_session(pd.concat([df, replayed], axis=1))
+        trials = study_store.select("subject_id == 2")
+        assert len(trials) == n_trials, "Session was stored twice!"
+        assert np.allclose(trials["reward"], replayed["reward"])
+        assert len(study_store.select()) == 2 * n_trials
+    return
+
+
+def test_subject_store():
+    """
+    Function to test that the subject store keeps the delta_pmt history
+    under concurrent writers, the subject's assignment, and their
+    completed sessions.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        subject_store = SubjectStore(os.path.join(data_dir, "subjects.db"))
+        assignment = option_assignment(SubjectOptionModel(subject_id=8))
+        subject_store.register_subject(8, assignment, study_seed=0)
+        subject_store.register_subject(8, assignment, study_seed=0)
+        assert subject_store.assignment(8) == assignment
+        try:
+            other = option_assignment(SubjectOptionModel(subject_id=9))
+            subject_store.register_subject(8, other, study_seed=0)
+            assert False, "Subject was assigned different options!"
+        except ValueError:
+            pass
+
+        # stations writing at once, each through its own connection
+        def record(delta_pmt):
+            SubjectStore(subject_store.db_path).record_delta_pmt(8, delta_pmt, day=1)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(record, np.arange(40) / 10))
+        subject_store.record_delta_pmt(8, 2.5, day=1, session_type="testing", session_id=0)
+        assert len(subject_store.delta_pmt_history(8)) == 41
+        assert subject_store.latest_delta_pmt(8) == 2.5
+        assert subject_store.latest_delta_pmt(9) is None
+
+        # sessions completed within the same second keep their order
+        sessions = [(1, "practice", 0), (1, "training", 0), (1, "testing", 0)]
+        sessions += [(2, "training", 1), (2, "testing", 1)]
+        for session in sessions:
+            subject_store.complete_session(8, *session)
+        assert subject_store.completed_sessions(8) == sessions
+    return
+
+
 if __name__ == "__main__":
     df_options = simulate_experiments()
     test_same_options_for_subject(df_options)
     df_trial_shuffle = test_subject_session_shuffle()
+    test_atlas_positions()
+    test_trial_state_machine()
+    test_trial_sequence_batch()
+    test_cohort_simulation()
+    test_parallel_simulation_reproducible()
+    test_power_analysis()
+    test_staircase_tuning()
+    test_stratified_rewards()
+    test_session_replay()
+    test_day_plan_roundtrip()
+    test_trial_logger()
+    test_checkpoint_resume()
+    test_study_store()
+    test_subject_store()
@@ -0,0 +1,18 @@
+import sys
+import tempfile
+import time
+from expt.timewarp import run_time_warped_day
+
+
+if __name__ == "__main__":
+    # run both days of a test subject on a virtual clock, e.g. before a release,
+    # writing to a scratch directory so the study's data is left untouched
+    subject_id = int(sys.argv[1]) if len(sys.argv) > 1 else 9999
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix="time_warp_")
+
+    for day in [1, 2]:
+        start = time.perf_counter()
+        run_time_warped_day({"Subject ID": subject_id, "Day": day}, data_dir)
+        duration = time.perf_counter() - start
+        print(f"Day {day} of subject {subject_id} ran in {duration:.1f} s")
+    print(f"Data written to {data_dir}")